@@ -1,12 +1,31 @@
 """LangGraph agent workflow with tool selection and reasoning."""
-from typing import TypedDict, Annotated, Sequence
+import asyncio
+import queue
+import threading
+from collections import OrderedDict
+from typing import Any, TypedDict, Annotated, AsyncIterator, Iterator, Optional, Sequence, Union
 import operator
 from langchain_groq import ChatGroq
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
-from agent.tools import get_tools
+from agent.tools import evaluate_arithmetic_query, get_tools
 from agent.graphrag import GraphRAGPipeline
+from agent.prompts import SYSTEM_PROMPT
+
+
+# Chat roles accepted in message dicts passed to AgenticAI.query
+_MESSAGE_TYPES = {
+    "system": SystemMessage,
+    "user": HumanMessage,
+    "assistant": AIMessage,
+}
+
+
+def _normalize_text(text) -> str:
+    """Case- and whitespace-insensitive form of a message, for response cache keys."""
+    return " ".join(str(text).lower().split())
 
 
 class AgentState(TypedDict):
@@ -19,19 +38,29 @@ class AgentState(TypedDict):
 class AgenticAI:
     """Main agentic AI system using LangGraph."""
     
-    def __init__(self, graphrag: GraphRAGPipeline, model_name: str = "llama-3.3-70b-versatile"):
+    def __init__(self, graphrag: GraphRAGPipeline, model_name: str = "llama-3.3-70b-versatile",
+                 response_cache_size: int = 256):
         self.graphrag = graphrag
         self.llm = ChatGroq(model=model_name, temperature=0)
         self.tools = get_tools(graphrag)
+        # Tool schemas are bound and the system prompt is built once, then reused every step
         self.llm_with_tools = self.llm.bind_tools(self.tools)
+        self._system_msg = SystemMessage(content=SYSTEM_PROMPT)
         self.graph = self._build_graph()
+        # Event loop thread driving astream for sync callers, started on first use
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        # LRU of final results keyed by normalized conversation (0 disables)
+        self.response_cache_size = response_cache_size
+        self._response_cache: "OrderedDict[Any, dict]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
     
     def _build_graph(self) -> StateGraph:
         """Build the LangGraph workflow."""
         workflow = StateGraph(AgentState)
         
-        # Add nodes
-        workflow.add_node("agent", self._agent_node)
+        # Add nodes (the agent node has a native async path for ainvoke)
+        workflow.add_node("agent", RunnableLambda(self._agent_node, afunc=self._aagent_node))
         workflow.add_node("tools", ToolNode(self.tools))
         
         # Set entry point
@@ -54,49 +83,45 @@ class AgenticAI:
     
     def _agent_node(self, state: AgentState) -> AgentState:
         """Agent node that processes messages and decides on tool usage."""
-        messages = state["messages"]
-        
-        # Add system message if not present
+        # Get response from LLM
+        response = self.llm_with_tools.invoke(self._with_system_message(state["messages"]))
+        return self._agent_update(response)
+    
+    async def _aagent_node(self, state: AgentState) -> AgentState:
+        """Async version of _agent_node."""
+        response = await self.llm_with_tools.ainvoke(self._with_system_message(state["messages"]))
+        return self._agent_update(response)
+    
+    def _with_system_message(self, messages: Sequence[BaseMessage]) -> Sequence[BaseMessage]:
+        """Prepend the system message if not present."""
         if not messages or not isinstance(messages[0], SystemMessage):
-            system_msg = SystemMessage(content="""
-            You are an intelligent AI assistant with access to a knowledge graph and various tools.
-            
-            Your capabilities:
-            1. Query a knowledge graph about films, series, actors, directors, and genres
-            2. Perform mathematical calculations
-            3. Search the web for current information
-            
-            Decision making:
-            - Use graph_query tool when questions are about films, series, actors, directors, genres, or their relationships
-            - Use calculator tool for mathematical expressions
-            - Use web_search tool for current events or information not in the graph
-            - You can use multiple tools in sequence if needed
-            - Provide clear, comprehensive answers based on the information you retrieve
-            
-            Always explain your reasoning and cite your sources.
-            """)
-            messages = [system_msg] + list(messages)
+            return [self._system_msg, *messages]
+        return messages
+    
+    @staticmethod
+    def _agent_update(response: BaseMessage) -> AgentState:
+        """State update for an LLM response."""
+        # Track tool usage; only the new entries are returned, the reducers append them
+        tool_calls = getattr(response, "tool_calls", []) or []
+        if not tool_calls:
+            return {"messages": [response]}
         
-        # Get response from LLM
-        response = self.llm_with_tools.invoke(messages)
+        tool_names = []
+        for tc in tool_calls:
+            if isinstance(tc, dict):
+                tool_names.append(tc.get("name", ""))
+            else:
+                tool_names.append(getattr(tc, "name", ""))
         
-        # Track tool usage
-        tool_calls = getattr(response, "tool_calls", []) or []
-        if tool_calls:
-            tool_names = []
-            for tc in tool_calls:
-                if isinstance(tc, dict):
-                    tool_names.append(tc.get("name", ""))
-                else:
-                    tool_names.append(getattr(tc, "name", ""))
-            state["tools_used"].extend(tool_names)
-            state["steps"].append({
+        return {
+            "messages": [response],
+            "tools_used": tool_names,
+            "steps": [{
                 "step": "tool_selection",
                 "tools": tool_names,
                 "reasoning": "Agent selected tools based on query analysis"
-            })
-        
-        return {"messages": [response]}
+            }]
+        }
     
     def _should_continue(self, state: AgentState) -> str:
         """Determine if the agent should continue or end."""
@@ -111,25 +136,212 @@ class AgenticAI:
         # Otherwise, end
         return "end"
     
-    def query(self, user_query: str) -> dict:
-        """Process a user query through the agent workflow."""
-        initial_state = {
-            "messages": [HumanMessage(content=user_query)],
-            "steps": [],
-            "tools_used": []
-        }
+    def query(self, user_query: Union[str, Sequence]) -> dict:
+        """Process a user query through the agent workflow.
+        
+        ``user_query`` is either the question text or a full conversation as
+        messages or ``{"role", "content"}`` dicts; a leading system message
+        replaces the default one. Repeated conversations are answered from
+        an LRU cache.
+        """
+        key = self._cache_key(user_query)
+        cached = self._cached_response(key)
+        if cached is not None:
+            return cached
+        
+        local = self._local_response(user_query)
+        if local is not None:
+            return self._store_response(key, local)
         
         # Run the graph
-        final_state = self.graph.invoke(initial_state)
+        final_state = self.graph.invoke(self._initial_state(user_query))
+        return self._store_response(key, self._result(final_state))
+    
+    async def aquery(self, user_query: Union[str, Sequence]) -> dict:
+        """Async version of query; LLM calls and tools run without blocking the event loop."""
+        key = self._cache_key(user_query)
+        cached = self._cached_response(key)
+        if cached is not None:
+            return cached
+        
+        local = self._local_response(user_query)
+        if local is not None:
+            return self._store_response(key, local)
         
+        final_state = await self.graph.ainvoke(self._initial_state(user_query))
+        return self._store_response(key, self._result(final_state))
+    
+    async def astream(self, user_query: Union[str, Sequence], result: Optional[dict] = None) -> AsyncIterator[str]:
+        """Yield response tokens as the LLM generates them.
+        
+        When ``result`` is given, it is filled with the same payload as
+        ``query`` once the workflow finishes.
+        """
+        key = self._cache_key(user_query)
+        cached = self._cached_response(key)
+        if cached is None:
+            local = self._local_response(user_query)
+            if local is not None:
+                cached = self._store_response(key, local)
+        if cached is not None:
+            if result is not None:
+                result.update(cached)
+            yield cached["response"]
+            return
+        
+        # "values" chunks carry the full state after each step; the last one is the final state
+        final_state = None
+        tool_call_ids = set()
+        async for mode, payload in self.graph.astream(
+            self._initial_state(user_query), stream_mode=["messages", "values"]
+        ):
+            if mode == "values":
+                final_state = payload
+                continue
+            
+            chunk, metadata = payload
+            # Only the agent's own LLM calls; once a call starts selecting tools, it is not the answer
+            if metadata.get("langgraph_node") != "agent":
+                continue
+            if getattr(chunk, "tool_call_chunks", None) or getattr(chunk, "tool_calls", None):
+                tool_call_ids.add(chunk.id)
+            if chunk.id not in tool_call_ids and isinstance(chunk.content, str) and chunk.content:
+                yield chunk.content
+        
+        if final_state is not None:
+            final = self._store_response(key, self._result(final_state))
+            if result is not None:
+                result.update(final)
+    
+    def stream(self, user_query: Union[str, Sequence], result: Optional[dict] = None) -> Iterator[str]:
+        """Sync version of astream, for callers without an event loop (e.g. Streamlit)."""
+        tokens: queue.Queue = queue.Queue()
+        done = object()
+        
+        async def produce():
+            try:
+                async for token in self.astream(user_query, result):
+                    tokens.put(token)
+            except Exception as e:
+                tokens.put(e)
+            finally:
+                tokens.put(done)
+        
+        asyncio.run_coroutine_threadsafe(produce(), self._background_loop())
+        while (item := tokens.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """Long-lived event loop thread, so async Neo4j connections are reused across calls."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return self._loop
+    
+    @staticmethod
+    def _cache_key(user_query: Union[str, Sequence]) -> Any:
+        """Response cache key: the normalized text of every message, with its role."""
+        if isinstance(user_query, str):
+            return _normalize_text(user_query)
+        return tuple(
+            (message.type, _normalize_text(message.content)) if isinstance(message, BaseMessage)
+            else (message["role"], _normalize_text(message["content"]))
+            for message in user_query
+        )
+    
+    def _cached_response(self, key: Any) -> Optional[dict]:
+        """Copy of the cached result for a key, or None."""
+        with self._response_cache_lock:
+            cached = self._response_cache.get(key)
+            if cached is None:
+                return None
+            self._response_cache.move_to_end(key)
+        return self._copy_result(cached)
+    
+    def _store_response(self, key: Any, result: dict) -> dict:
+        """Cache a result, evicting the least recently used entry when full."""
+        if self.response_cache_size > 0:
+            with self._response_cache_lock:
+                self._response_cache[key] = self._copy_result(result)
+                self._response_cache.move_to_end(key)
+                while len(self._response_cache) > self.response_cache_size:
+                    self._response_cache.popitem(last=False)
+        return self._copy_result(result)
+    
+    @staticmethod
+    def _copy_result(result: dict) -> dict:
+        """Copy of a result whose steps and tools lists are not shared with the original."""
+        return {
+            **result,
+            "tools_used": list(result["tools_used"]),
+            "steps": [dict(step) for step in result["steps"]],
+        }
+    
+    @staticmethod
+    def _local_response(user_query: Union[str, Sequence]) -> Optional[dict]:
+        """Answer a pure arithmetic question with the calculator directly, skipping the LLM.
+        
+        For a conversation, the question is the last message when it comes
+        from the user; earlier turns cannot change the value of an arithmetic
+        expression.
+        """
+        if isinstance(user_query, str):
+            question, message_count = user_query, 2
+        elif user_query:
+            last = user_query[-1]
+            if isinstance(last, BaseMessage):
+                question = last.content if isinstance(last, HumanMessage) else None
+            else:
+                question = last["content"] if last.get("role") == "user" else None
+            message_count = len(user_query) + 1
+        else:
+            return None
+        if not isinstance(question, str):
+            return None
+        value = evaluate_arithmetic_query(question)
+        if value is None:
+            return None
+        return {
+            "response": f"The result is {value}.",
+            "tools_used": ["calculator"],
+            "steps": [{
+                "step": "tool_selection",
+                "tools": ["calculator"],
+                "reasoning": "Pure arithmetic query evaluated locally"
+            }],
+            "message_count": message_count
+        }
+    
+    @staticmethod
+    def _initial_state(user_query: Union[str, Sequence]) -> AgentState:
+        """Workflow input for a user query."""
+        if isinstance(user_query, str):
+            messages = [HumanMessage(content=user_query)]
+        else:
+            messages = [
+                message if isinstance(message, BaseMessage)
+                else _MESSAGE_TYPES[message["role"]](content=message["content"])
+                for message in user_query
+            ]
+        return {
+            "messages": messages,
+            "steps": [],
+            "tools_used": []
+        }
+    
+    @staticmethod
+    def _result(final_state: AgentState) -> dict:
+        """Response payload from the final workflow state."""
         # Extract final response
         final_message = final_state["messages"][-1]
         response_text = final_message.content if hasattr(final_message, "content") else str(final_message)
         
         return {
             "response": response_text,
-            "tools_used": list(set(final_state["tools_used"])),
+            "tools_used": list(dict.fromkeys(final_state["tools_used"])),
             "steps": final_state["steps"],
             "message_count": len(final_state["messages"])
         }
-
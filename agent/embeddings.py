@@ -0,0 +1,161 @@
+"""Embedding model backends for the GraphRAG pipeline."""
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # optional: the numpy versions below are used instead
+    njit = None
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+def _normalize_1d_numpy(vector: np.ndarray) -> np.ndarray:
+    """Unit-length copy of a vector (numpy)."""
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector.copy()
+
+
+def _normalize_2d_numpy(matrix: np.ndarray) -> np.ndarray:
+    """Row-normalized copy of a matrix (numpy)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0).astype(matrix.dtype)
+
+
+if njit is not None:
+    @njit(fastmath=True, cache=True)
+    def _normalize_1d(vector):
+        """Unit-length copy of a float32 vector (numba)."""
+        total = 0.0
+        for i in range(vector.shape[0]):
+            total += vector[i] * vector[i]
+        out = vector.copy()
+        if total > 0.0:
+            scale = 1.0 / np.sqrt(total)
+            for i in range(vector.shape[0]):
+                out[i] = vector[i] * scale
+        return out
+    
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _normalize_2d(matrix):
+        """Row-normalized copy of a float32 matrix, rows in parallel (numba)."""
+        out = matrix.copy()
+        for row in prange(matrix.shape[0]):
+            total = 0.0
+            for i in range(matrix.shape[1]):
+                total += matrix[row, i] * matrix[row, i]
+            if total > 0.0:
+                scale = 1.0 / np.sqrt(total)
+                for i in range(matrix.shape[1]):
+                    out[row, i] = matrix[row, i] * scale
+        return out
+else:
+    _normalize_1d = _normalize_1d_numpy
+    _normalize_2d = _normalize_2d_numpy
+
+
+def l2_normalize(values: np.ndarray) -> np.ndarray:
+    """L2-normalize a float32 vector or each row of a matrix; zero rows are left as is."""
+    # One contiguous float32 signature per dimensionality, so numba compiles each kernel once
+    values = np.ascontiguousarray(values, dtype=np.float32)
+    if values.ndim == 1:
+        return _normalize_1d(values)
+    return _normalize_2d(values)
+
+
+def quantize_int8(vector: Sequence[float]) -> Tuple[bytes, float]:
+    """Symmetric per-vector INT8 quantization: (int8 bytes, scale)."""
+    vector = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return quantized.tobytes(), scale
+
+
+def dequantize_int8(data: bytes, scale: float) -> np.ndarray:
+    """Inverse of quantize_int8, as float32."""
+    return np.frombuffer(data, dtype=np.int8).astype(np.float32) * np.float32(scale)
+
+
+class OnnxSentenceEncoder:
+    """INT8-quantized ONNX Runtime port of a sentence-transformers model.
+    
+    Exposes the subset of ``SentenceTransformer.encode`` used by the
+    pipeline. The model is exported and dynamically quantized on first use,
+    then loaded from ``cache_dir`` on subsequent runs.
+    """
+    
+    QUANTIZED_FILE = "model_quantized.onnx"
+    
+    def __init__(self, model_name: str = DEFAULT_MODEL, cache_dir: str = ".onnx", max_length: int = 256):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+        
+        model_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        export_dir = Path(cache_dir) / model_id.replace("/", "__")
+        
+        if not (export_dir / self.QUANTIZED_FILE).exists():
+            model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+            model.save_pretrained(export_dir)
+            AutoTokenizer.from_pretrained(model_id).save_pretrained(export_dir)
+            quantizer = ORTQuantizer.from_pretrained(export_dir)
+            quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=export_dir, quantization_config=quantization_config)
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            export_dir,
+            file_name=self.QUANTIZED_FILE,
+            provider="CPUExecutionProvider",
+        )
+        self.max_length = max_length
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+               show_progress_bar: bool = False) -> np.ndarray:
+        """Mean-pooled sentence embeddings, shaped like SentenceTransformer.encode."""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            token_embeddings = np.asarray(self.model(**inputs).last_hidden_state, dtype=np.float32)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled)
+        
+        embeddings = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        if normalize_embeddings and embeddings.size:
+            embeddings = l2_normalize(embeddings)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(model_name: str = DEFAULT_MODEL, backend: Optional[str] = None):
+    """Load the embedding model for the configured backend.
+    
+    ``backend`` defaults to the ``EMBEDDING_BACKEND`` environment variable.
+    ``"onnx"`` selects the quantized ONNX Runtime encoder and falls back to
+    sentence-transformers when optimum is not installed. Downloaded
+    sentence-transformers weights are kept in ``MODEL_CACHE_DIR``
+    (default ``.models``) so later runs load them from disk.
+    """
+    backend = (backend or os.getenv("EMBEDDING_BACKEND", "sentence-transformers")).lower()
+    if backend == "onnx":
+        try:
+            return OnnxSentenceEncoder(model_name)
+        except ImportError as e:
+            print(f"Note: ONNX embedding backend unavailable, using sentence-transformers: {e}")
+    
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, cache_folder=os.getenv("MODEL_CACHE_DIR", ".models"))
@@ -1,47 +1,435 @@
 """GraphRAG pipeline for hybrid retrieval using vector similarity and Cypher queries."""
+import asyncio
+import copy
+import hashlib
 import os
-from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
+import re
+import shelve
+import threading
+import time
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
+from agent.embeddings import DEFAULT_MODEL, dequantize_int8, l2_normalize, load_embedding_model
 from graph_db.client import Neo4jClient
+from graph_db.schema import ENTITY_LABEL, FULLTEXT_INDEX
 from dotenv import load_dotenv
 
+try:
+    import faiss
+except ImportError:  # optional: numpy brute force is used instead
+    faiss = None
+
 load_dotenv()
 
+# Matrices at least this large get an approximate HNSW index instead of a flat one
+_HNSW_MIN_ROWS = 50_000
+
+# Online native vector (Neo4j 5.11+) and full-text indexes
+_SEARCH_INDEXES_QUERY = """
+SHOW INDEXES YIELD name, type, state
+WHERE type IN ['VECTOR', 'FULLTEXT'] AND state = 'ONLINE'
+RETURN collect(name) AS names
+"""
+
+
+def _labels_expression(var: str) -> str:
+    """Cypher list of a node's labels, without the shared Entity label."""
+    return f"[label IN labels({var}) WHERE label <> '{ENTITY_LABEL}']"
+
+
+_VECTOR_INDEX_SEARCH_QUERY = f"""
+CALL db.index.vector.queryNodes($index_name, $top_k, $embedding)
+YIELD node, score
+RETURN node {{.*, embedding: null, embedding_q8: null, embedding_scale: null, _labels: {_labels_expression("node")}}} AS n, score
+"""
+
+# Labels vector search may target; each maps to one constant query text so
+# the server's plan cache is hit and no caller-supplied text reaches Cypher.
+# Similarity is computed in Python, which works with all Neo4j versions.
+_SEARCHABLE_LABELS = (ENTITY_LABEL, "Film", "Serie", "Actor", "Director", "Genre")
+
+# Nodes with an INT8 copy (embedding_q8 + embedding_scale) ship only that,
+# a quarter of the FP32 list's size
+_MATRIX_QUERY_BY_LABEL = {
+    label: f"""
+MATCH (n:{label})
+WHERE n.embedding IS NOT NULL OR n.embedding_q8 IS NOT NULL
+RETURN n {{.*, embedding: CASE WHEN n.embedding_q8 IS NULL THEN n.embedding END, _labels: {_labels_expression("n")}}} AS n
+LIMIT 200
+"""
+    for label in _SEARCHABLE_LABELS
+}
+
+# Node properties holding embeddings, never shown as context
+_EMBEDDING_PROPERTIES = ("embedding", "embedding_q8", "embedding_scale")
+
+# Properties left out of the context text; _labels is projected by the queries
+_CONTEXT_EXCLUDED_PROPERTIES = frozenset(("id", "_labels") + _EMBEDDING_PROPERTIES)
+
+
+def _node_projection(var: str) -> str:
+    """Cypher map projection of a node without embeddings, carrying its labels."""
+    return (
+        f"{var} {{.*, embedding: null, embedding_q8: null, embedding_scale: null, "
+        f"_labels: {_labels_expression(var)}}} AS {var}"
+    )
+
+
+# Traversal queries by intent
+_CYPHER_ACTOR = f"""
+MATCH (a:Actor)-[:JOUE_DANS]->(content)
+RETURN {_node_projection("a")}, {_node_projection("content")}
+LIMIT 20
+"""
+
+_CYPHER_DIRECTOR = f"""
+MATCH (d:Director)-[:REALISE]->(content)
+RETURN {_node_projection("d")}, {_node_projection("content")}
+LIMIT 20
+"""
+
+_CYPHER_GENRE = f"""
+MATCH (content)-[:APPARTIENT_A_GENRE]->(g:Genre)
+RETURN {_node_projection("content")}, {_node_projection("g")}
+LIMIT 20
+"""
+
+_CYPHER_FILM = f"""
+MATCH (f:Film)
+OPTIONAL MATCH (a:Actor)-[:JOUE_DANS]->(f)
+OPTIONAL MATCH (d:Director)-[:REALISE]->(f)
+RETURN {_node_projection("f")}, {_node_projection("a")}, {_node_projection("d")}
+LIMIT 20
+"""
+
+_CYPHER_SERIE = f"""
+MATCH (s:Serie)
+OPTIONAL MATCH (a:Actor)-[:JOUE_DANS]->(s)
+OPTIONAL MATCH (d:Director)-[:REALISE]->(s)
+RETURN {_node_projection("s")}, {_node_projection("a")}, {_node_projection("d")}
+LIMIT 20
+"""
+
+_CYPHER_COLLABORATION = f"""
+MATCH (a1:Actor)-[:A_JOUÉ_AVEC]->(a2:Actor)
+RETURN {_node_projection("a1")}, {_node_projection("a2")}
+LIMIT 20
+"""
+
+# Generic traversal: subgraph around the nodes whose names match the query
+_CYPHER_GENERIC_FULLTEXT = f"""
+CALL db.index.fulltext.queryNodes($index_name, $search) YIELD node
+WITH node AS start LIMIT 5
+MATCH (start)-[*1..2]-(connected)
+RETURN DISTINCT {_node_projection("start")}, {_node_projection("connected")}
+LIMIT 20
+"""
+
+# Substring scan over every node, used only when the full-text index is missing
+_CYPHER_GENERIC = f"""
+MATCH (start)-[*1..2]-(connected)
+WHERE start.name CONTAINS $query OR connected.name CONTAINS $query
+RETURN DISTINCT {_node_projection("start")}, {_node_projection("connected")}
+LIMIT 20
+"""
+
+# Lucene query syntax characters, escaped so user text is matched literally
+_LUCENE_SPECIAL_RE = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+# Intent keywords, matched as substrings of the lowercased query
+_INTENT_RE = re.compile(
+    r"(?P<actor>act|played|joué)"
+    r"|(?P<director>direct|réalisé)"
+    r"|(?P<genre>genre|type)"
+    r"|(?P<film>film|movie)"
+    r"|(?P<serie>serie|show)"
+    r"|(?P<collaboration>worked|together|collabor)"
+)
+
+# In priority order: the first intent present in a query wins
+_CYPHER_BY_INTENT = {
+    "actor": _CYPHER_ACTOR,
+    "director": _CYPHER_DIRECTOR,
+    "genre": _CYPHER_GENRE,
+    "film": _CYPHER_FILM,
+    "serie": _CYPHER_SERIE,
+    "collaboration": _CYPHER_COLLABORATION,
+}
+
+
+@lru_cache(maxsize=2048)
+def _encode_cached(model: Any, text: str) -> Tuple[float, ...]:
+    """Encode a single text, memoized per (model, text)."""
+    embedding = model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+    return tuple(embedding.tolist())
+
+
+class SemanticCache:
+    """Fixed-size LRU cache of results keyed by normalized query embeddings.
+    
+    A lookup hits when a stored vector in the same namespace has a cosine
+    similarity of at least ``threshold`` with the query and is younger than
+    ``ttl`` seconds. Values are deep-copied in and out, so callers never
+    share them with the cache.
+    """
+    
+    def __init__(self, dim: int, max_size: int = 256, threshold: float = 0.95, ttl: float = 300.0):
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors = np.zeros((max_size, dim), dtype=np.float32)
+        self._namespaces = np.full(max_size, -1, dtype=np.int64)
+        self._created = np.zeros(max_size)
+        self._last_used = np.zeros(max_size)
+        self._values: List[Any] = [None] * max_size
+        self._namespace_ids: Dict[Any, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, namespace: Any, vector: np.ndarray) -> Optional[Any]:
+        """Return the cached value closest to vector, or None on a miss."""
+        with self._lock:
+            namespace_id = self._namespace_ids.get(namespace)
+            if namespace_id is None or self._size == 0:
+                return None
+            
+            now = time.monotonic()
+            n = self._size
+            live = (self._namespaces[:n] == namespace_id) & (now - self._created[:n] < self.ttl)
+            scores = np.where(live, self._vectors[:n] @ vector, -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            self._last_used[best] = now
+            value = self._values[best]
+        return copy.deepcopy(value)
+    
+    def put(self, namespace: Any, vector: np.ndarray, value: Any):
+        """Store a value, evicting the least recently used entry when full."""
+        value = copy.deepcopy(value)
+        with self._lock:
+            namespace_id = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+            if self._size < len(self._values):
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            
+            now = time.monotonic()
+            self._vectors[slot] = vector
+            self._namespaces[slot] = namespace_id
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._values[slot] = value
+    
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._size = 0
+            self._values = [None] * len(self._values)
+
 
 class GraphRAGPipeline:
     """GraphRAG pipeline combining vector search and graph traversal."""
     
-    def __init__(self, neo4j_client: Neo4jClient):
+    def __init__(self, neo4j_client: Neo4jClient, cache_ttl: float = 300.0,
+                 model_name: str = DEFAULT_MODEL, embedding_cache_path: Optional[str] = None):
         self.client = neo4j_client
-        # Use a smaller model for embeddings
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Use a smaller model for embeddings (EMBEDDING_BACKEND=onnx for the INT8 ONNX port)
+        self.model_name = model_name
+        self.embedding_model = load_embedding_model(model_name)
         self.embedding_dim = 384
+        # Per-label (normalized embedding matrix, nodes, FAISS index, build time) cache
+        self.cache_ttl = cache_ttl
+        self._emb_cache: Dict[str, Tuple[np.ndarray, List[Dict[str, Any]], Any, float]] = {}
+        # ((INT8 bytes, scale), normalized float32 row) by node id, reused across matrix rebuilds
+        # while the stored embedding is unchanged
+        self._node_embeddings_cache: Dict[str, Tuple[Tuple[bytes, float], np.ndarray]] = {}
+        self._cache_lock = threading.Lock()
+        # Native vector index per label, used when it exists on the server
+        self.vector_indexes: Dict[str, str] = {ENTITY_LABEL: "entity_embeddings"}
+        # Full-text index over node names for generic traversal (see GraphSchema)
+        self.fulltext_index = FULLTEXT_INDEX
+        self._search_index_cache: Optional[set] = None
+        # Recent hybrid_retrieval results keyed by query embedding
+        self._semantic_cache = SemanticCache(self.embedding_dim, ttl=cache_ttl)
+        # Optional on-disk embedding cache shared across runs (EMBEDDING_CACHE_PATH)
+        embedding_cache_path = embedding_cache_path or os.getenv("EMBEDDING_CACHE_PATH")
+        self._disk_cache = shelve.open(embedding_cache_path) if embedding_cache_path else None
+        self._disk_cache_lock = threading.Lock()
+    
+    def close(self):
+        """Flush and close the on-disk embedding cache, if any."""
+        with self._disk_cache_lock:
+            if self._disk_cache is not None:
+                self._disk_cache.close()
+                self._disk_cache = None
+    
+    def _disk_cache_key(self, text: str) -> str:
+        """Disk cache key; includes the model name so switching models never reuses vectors."""
+        return hashlib.sha256(f"{self.model_name}|{text}".encode("utf-8")).hexdigest()
     
     def get_embedding(self, text: str) -> List[float]:
-        """Generate embedding for a text."""
-        embedding = self.embedding_model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
-    
-    def vector_search(self, query: str, top_k: int = 5, label: str = "Node") -> List[Dict[str, Any]]:
-        """Perform vector similarity search in Neo4j."""
-        query_embedding = self.get_embedding(query)
-        
-        # Get all nodes with embeddings and calculate similarity manually
-        # This approach works with all Neo4j versions
-        cypher_query = f"""
-        MATCH (n:{label})
-        WHERE n.embedding IS NOT NULL
-        RETURN n
-        LIMIT 200
-        """
-        all_nodes = self.client.execute_query(cypher_query)
+        """Generate a normalized embedding for a text (memoized, and cached on disk if enabled)."""
+        if self._disk_cache is None:
+            return list(_encode_cached(self.embedding_model, text))
+        
+        key = self._disk_cache_key(text)
+        with self._disk_cache_lock:
+            data = self._disk_cache.get(key)
+        if data is not None:
+            return np.frombuffer(data, dtype=np.float32).tolist()
+        
+        embedding = _encode_cached(self.embedding_model, text)
+        with self._disk_cache_lock:
+            self._disk_cache[key] = np.asarray(embedding, dtype=np.float32).tobytes()
+        return list(embedding)
+    
+    def get_embeddings(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Generate normalized embeddings for several texts in batched forward passes."""
+        if self._disk_cache is None:
+            return self._encode_batch(texts, batch_size)
         
-        # Calculate cosine similarity manually
-        query_vec = np.array(query_embedding)
-        results = []
+        # Only texts missing from the disk cache go through the model
+        keys = [self._disk_cache_key(text) for text in texts]
+        with self._disk_cache_lock:
+            cached = [self._disk_cache.get(key) for key in keys]
+        embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        missing = [i for i, data in enumerate(cached) if data is None]
+        for i, data in enumerate(cached):
+            if data is not None:
+                embeddings[i] = np.frombuffer(data, dtype=np.float32)
         
-        for record in all_nodes:
+        if missing:
+            encoded = self._encode_batch([texts[i] for i in missing], batch_size)
+            embeddings[missing] = encoded
+            with self._disk_cache_lock:
+                for i, row in zip(missing, encoded):
+                    self._disk_cache[keys[i]] = row.tobytes()
+        return embeddings
+    
+    def _encode_batch(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Encode texts with the model as normalized float32 rows."""
+        return self.embedding_model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+    
+    def warmup(self):
+        """Prime the connection pool, index lookup, embedding matrix and model before the first query."""
+        try:
+            self.client.get_graph_info()
+            self.hybrid_retrieval("warmup", no_cache=True)
+        except Exception as e:
+            print(f"Note: Warmup failed: {e}")
+    
+    def refresh(self, label: Optional[str] = None):
+        """Invalidate cached embedding matrices for one label, or all labels."""
+        with self._cache_lock:
+            if label is None:
+                self._emb_cache.clear()
+            else:
+                self._emb_cache.pop(label, None)
+            self._node_embeddings_cache.clear()
+            self._search_index_cache = None
+        self._semantic_cache.clear()
+    
+    def _search_index_names(self) -> set:
+        """Names of online vector and full-text indexes, looked up once."""
+        if self._search_index_cache is None:
+            self._search_index_cache = self._index_names(self.client.execute_query(_SEARCH_INDEXES_QUERY))
+        return self._search_index_cache
+    
+    async def _asearch_index_names(self) -> set:
+        """Async version of _search_index_names."""
+        if self._search_index_cache is None:
+            records = await self.client.aexecute_query(_SEARCH_INDEXES_QUERY)
+            self._search_index_cache = self._index_names(records)
+        return self._search_index_cache
+    
+    @staticmethod
+    def _index_names(records: List[Dict[str, Any]]) -> set:
+        """Index names from the _SEARCH_INDEXES_QUERY result."""
+        return set(records[0].get("names", [])) if records else set()
+    
+    @staticmethod
+    def _index_search_params(index_name: str, query_vec: np.ndarray, top_k: int) -> Dict[str, Any]:
+        """Parameters for _VECTOR_INDEX_SEARCH_QUERY."""
+        return {"index_name": index_name, "top_k": top_k, "embedding": query_vec.tolist()}
+    
+    @staticmethod
+    def _index_results(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Vector index hits as search results."""
+        # Neo4j reports cosine scores as (1 + cos) / 2; map back to cosine similarity
+        return [
+            {"n": dict(record["n"]), "similarity": 2.0 * float(record["score"]) - 1.0}
+            for record in records
+        ]
+    
+    def _get_embedding_matrix(self, label: str) -> Tuple[np.ndarray, List[Dict[str, Any]], Any]:
+        """Return the L2-normalized embedding matrix, parallel node list and FAISS index for a label."""
+        cached = self._cached_matrix(label)
+        if cached is not None:
+            return cached
+        return self._store_matrix(label, self.client.execute_query(self._matrix_query(label)))
+    
+    async def _aget_embedding_matrix(self, label: str) -> Tuple[np.ndarray, List[Dict[str, Any]], Any]:
+        """Async version of _get_embedding_matrix."""
+        cached = self._cached_matrix(label)
+        if cached is not None:
+            return cached
+        records = await self.client.aexecute_query(self._matrix_query(label))
+        return self._store_matrix(label, records)
+    
+    def _cached_matrix(self, label: str) -> Optional[Tuple[np.ndarray, List[Dict[str, Any]], Any]]:
+        """The cached matrix for a label, or None if missing or older than cache_ttl."""
+        cached = self._emb_cache.get(label)
+        if cached is not None and time.monotonic() - cached[3] < self.cache_ttl:
+            return cached[:3]
+        return None
+    
+    @staticmethod
+    def _matrix_query(label: str) -> str:
+        """Cypher fetching the embedded nodes of an allowed label."""
+        try:
+            return _MATRIX_QUERY_BY_LABEL[label]
+        except KeyError:
+            raise ValueError(f"Unsupported label for vector search: {label!r}") from None
+    
+    def _store_matrix(self, label: str, records: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[Dict[str, Any]], Any]:
+        """Build the matrix (and FAISS index) for a label from query records and cache it."""
+        matrix, nodes = self._build_embedding_matrix(records)
+        index = self._build_search_index(matrix)
+        
+        # Empty results are not cached so a fresh graph is picked up immediately
+        if nodes:
+            with self._cache_lock:
+                self._emb_cache[label] = (matrix, nodes, index, time.monotonic())
+        return matrix, nodes, index
+    
+    @staticmethod
+    def _build_search_index(matrix: np.ndarray) -> Any:
+        """Inner-product FAISS index over a normalized matrix, or None without faiss."""
+        if faiss is None or matrix.shape[0] == 0:
+            return None
+        
+        dim = matrix.shape[1]
+        if matrix.shape[0] >= _HNSW_MIN_ROWS:
+            index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexFlatIP(dim)
+        index.add(np.ascontiguousarray(matrix))
+        return index
+    
+    def _build_embedding_matrix(self, records: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Stack node embeddings into a contiguous, row-normalized float32 matrix."""
+        nodes = []
+        rows = []
+        for record in records:
             node_data = record.get("n", {})
             # Handle Neo4j node objects
             if hasattr(node_data, 'items'):
@@ -50,96 +438,213 @@ class GraphRAGPipeline:
                 node = node_data
             else:
                 continue
-                
-            if "embedding" in node and node["embedding"]:
-                try:
-                    node_vec = np.array(node["embedding"])
-                    # Calculate cosine similarity
-                    dot_product = np.dot(query_vec, node_vec)
-                    norm_query = np.linalg.norm(query_vec)
-                    norm_node = np.linalg.norm(node_vec)
-                    
-                    if norm_query > 0 and norm_node > 0:
-                        similarity = dot_product / (norm_query * norm_node)
-                        results.append({
-                            "n": node,
-                            "similarity": float(similarity)
-                        })
-                except Exception as e:
-                    # Skip nodes with invalid embeddings
-                    continue
+            
+            embedding = node.pop("embedding", None)
+            quantized = node.pop("embedding_q8", None)
+            scale = node.pop("embedding_scale", None)
+            row = self._node_row(node.get("id"), embedding, quantized, scale)
+            if row is not None:
+                nodes.append(node)
+                rows.append(row)
+        
+        if not nodes:
+            return np.empty((0, self.embedding_dim), dtype=np.float32), []
+        return np.stack(rows), nodes
+    
+    def _node_row(self, node_id: Optional[str], embedding: Optional[List[float]],
+                  quantized: Optional[bytes] = None, scale: Optional[float] = None) -> Optional[np.ndarray]:
+        """Normalized float32 embedding row for a node; INT8 rows are dequantized once per stored value."""
+        # Only INT8 rows are cached: comparing the stored bytes is far cheaper than dequantizing,
+        # while checking an FP32 list costs as much as normalizing it again
+        source = (quantized, scale) if quantized is not None and scale is not None else None
+        cached = self._node_embeddings_cache.get(node_id) if source is not None and node_id is not None else None
+        if cached is not None and cached[0] == source:
+            return cached[1]
+        
+        if source is not None:
+            embedding = dequantize_int8(quantized, scale)
+        
+        # Keep only nodes whose embedding matches the model dimension
+        if embedding is None or len(embedding) != self.embedding_dim:
+            return None
+        row = l2_normalize(embedding)
+        if not row.any():
+            return None
+        if source is not None and node_id is not None:
+            self._node_embeddings_cache[node_id] = (source, row)
+        return row
+    
+    def _query_vector(self, query: str) -> Optional[np.ndarray]:
+        """Embed a query as a unit-length float32 vector (None if degenerate)."""
+        # Embeddings are L2-normalized by the encoder, so no norm is needed here
+        query_vec = np.asarray(self.get_embedding(query), dtype=np.float32)
+        return query_vec if query_vec.any() else None
+    
+    def vector_search(self, query: str, top_k: int = 5, label: str = ENTITY_LABEL) -> List[Dict[str, Any]]:
+        """Perform vector similarity search over the cached embedding matrix."""
+        query_vec = self._query_vector(query)
+        if query_vec is None:
+            return []
+        return self._search_by_vector(query_vec, top_k, label)
+    
+    def _search_by_vector(self, query_vec: np.ndarray, top_k: int, label: str) -> List[Dict[str, Any]]:
+        """Rank the nodes of a label against a normalized query vector."""
+        # Prefer the server-side vector index when one covers this label
+        index_name = self.vector_indexes.get(label)
+        if index_name and top_k > 0 and index_name in self._search_index_names():
+            records = self.client.execute_query(
+                _VECTOR_INDEX_SEARCH_QUERY, self._index_search_params(index_name, query_vec, top_k)
+            )
+            if records:
+                return self._index_results(records)
+        
+        # Fall back to brute-force similarity over the cached embedding matrix
+        matrix, nodes, index = self._get_embedding_matrix(label)
+        return self._rank(matrix, nodes, query_vec, top_k, index)
+    
+    async def _asearch_by_vector(self, query_vec: np.ndarray, top_k: int, label: str) -> List[Dict[str, Any]]:
+        """Async version of _search_by_vector."""
+        index_name = self.vector_indexes.get(label)
+        if index_name and top_k > 0 and index_name in await self._asearch_index_names():
+            records = await self.client.aexecute_query(
+                _VECTOR_INDEX_SEARCH_QUERY, self._index_search_params(index_name, query_vec, top_k)
+            )
+            if records:
+                return self._index_results(records)
+        
+        matrix, nodes, index = await self._aget_embedding_matrix(label)
+        return self._rank(matrix, nodes, query_vec, top_k, index)
+    
+    @staticmethod
+    def _rank(matrix: np.ndarray, nodes: List[Dict[str, Any]], query_vec: np.ndarray,
+              top_k: int, index: Any = None) -> List[Dict[str, Any]]:
+        """Top-k nodes by cosine similarity against a row-normalized matrix."""
+        if not nodes or top_k <= 0:
+            return []
+        
+        # FAISS returns the top_k directly from one SIMD search
+        if index is not None:
+            scores, ids = index.search(query_vec.reshape(1, -1), min(top_k, len(nodes)))
+            return [
+                {"n": nodes[i], "similarity": float(score)}
+                for score, i in zip(scores[0], ids[0])
+                if i >= 0
+            ]
         
-        # Sort by similarity and return top_k
-        results.sort(key=lambda x: x.get("similarity", 0), reverse=True)
-        return results[:top_k]
+        # Score every node with a single matrix-vector product
+        similarities = matrix @ query_vec
+        
+        # Select the top_k without sorting every score
+        k = min(top_k, similarities.shape[0])
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        
+        return [
+            {"n": nodes[i], "similarity": float(similarities[i])}
+            for i in top
+        ]
     
     def graph_traversal(self, query: str, max_depth: int = 2) -> List[Dict[str, Any]]:
         """Perform graph traversal using Cypher queries based on query intent."""
-        query_lower = query.lower()
-        
-        # Pattern matching for different query types
-        if "act" in query_lower or "actor" in query_lower or "played" in query_lower or "joué" in query_lower:
-            cypher = """
-            MATCH (a:Actor)-[:JOUE_DANS]->(content)
-            RETURN a, content
-            LIMIT 20
-            """
-        elif "direct" in query_lower or "director" in query_lower or "réalisé" in query_lower:
-            cypher = """
-            MATCH (d:Director)-[:REALISE]->(content)
-            RETURN d, content
-            LIMIT 20
-            """
-        elif "genre" in query_lower or "type" in query_lower:
-            cypher = """
-            MATCH (content)-[:APPARTIENT_A_GENRE]->(g:Genre)
-            RETURN content, g
-            LIMIT 20
-            """
-        elif "film" in query_lower or "movie" in query_lower:
-            cypher = """
-            MATCH (f:Film)
-            OPTIONAL MATCH (a:Actor)-[:JOUE_DANS]->(f)
-            OPTIONAL MATCH (d:Director)-[:REALISE]->(f)
-            RETURN f, a, d
-            LIMIT 20
-            """
-        elif "serie" in query_lower or "series" in query_lower or "show" in query_lower:
-            cypher = """
-            MATCH (s:Serie)
-            OPTIONAL MATCH (a:Actor)-[:JOUE_DANS]->(s)
-            OPTIONAL MATCH (d:Director)-[:REALISE]->(s)
-            RETURN s, a, d
-            LIMIT 20
-            """
-        elif "worked" in query_lower or "together" in query_lower or "collabor" in query_lower:
-            cypher = """
-            MATCH (a1:Actor)-[:A_JOUÉ_AVEC]->(a2:Actor)
-            RETURN a1, a2
-            LIMIT 20
-            """
+        cypher = self._intent_query(query)
+        if cypher is not None:
+            return self.client.execute_query(cypher)
+        
+        # Generic query - get connected subgraph, via the full-text index when it exists
+        search = self._fulltext_search(query)
+        if search and self.fulltext_index in self._search_index_names():
+            return self.client.execute_query(
+                _CYPHER_GENERIC_FULLTEXT, {"index_name": self.fulltext_index, "search": search}
+            )
+        return self.client.execute_query(_CYPHER_GENERIC, {"query": query})
+    
+    async def agraph_traversal(self, query: str, max_depth: int = 2) -> List[Dict[str, Any]]:
+        """Async version of graph_traversal."""
+        cypher = self._intent_query(query)
+        if cypher is not None:
+            return await self.client.aexecute_query(cypher)
+        
+        search = self._fulltext_search(query)
+        if search and self.fulltext_index in await self._asearch_index_names():
+            return await self.client.aexecute_query(
+                _CYPHER_GENERIC_FULLTEXT, {"index_name": self.fulltext_index, "search": search}
+            )
+        return await self.client.aexecute_query(_CYPHER_GENERIC, {"query": query})
+    
+    @staticmethod
+    def _intent_query(query: str) -> Optional[str]:
+        """The Cypher query matching the query intent, or None for a generic query."""
+        intents = {match.lastgroup for match in _INTENT_RE.finditer(query.lower())}
+        for intent, cypher in _CYPHER_BY_INTENT.items():
+            if intent in intents:
+                return cypher
+        return None
+    
+    @staticmethod
+    def _fulltext_search(query: str) -> str:
+        """Escape a query for Lucene; lowercased so AND/OR/NOT stay plain words."""
+        return _LUCENE_SPECIAL_RE.sub(r"\\\1", query.strip().lower())
+    
+    def hybrid_retrieval(self, query: str, top_k: int = 5, label: str = ENTITY_LABEL,
+                         no_cache: bool = False) -> Dict[str, Any]:
+        """Perform hybrid retrieval combining vector search and graph traversal.
+        
+        Results are cached by query embedding, so paraphrases of a recent
+        query are answered without touching Neo4j. Pass no_cache=True to
+        bypass the cache.
+        """
+        return self._hybrid_retrieval(query, self._query_vector(query), top_k, label, no_cache)
+    
+    async def ahybrid_retrieval(self, query: str, top_k: int = 5, label: str = ENTITY_LABEL,
+                                no_cache: bool = False) -> Dict[str, Any]:
+        """Async hybrid retrieval; vector search and traversal run concurrently."""
+        query_vec = await asyncio.to_thread(self._query_vector, query)
+        namespace = (label, top_k)
+        if query_vec is not None and not no_cache:
+            cached = self._semantic_cache.get(namespace, query_vec)
+            if cached is not None:
+                return cached
+        
+        if query_vec is not None:
+            vector_results, traversal_results = await asyncio.gather(
+                self._asearch_by_vector(query_vec, top_k, label),
+                self.agraph_traversal(query),
+            )
         else:
-            # Generic query - get connected subgraph
-            cypher = """
-            MATCH path = (start)-[*1..2]-(connected)
-            WHERE start.name CONTAINS $query OR connected.name CONTAINS $query
-            RETURN path
-            LIMIT 20
-            """
-            return self.client.execute_query(cypher, {"query": query})
-        
-        return self.client.execute_query(cypher)
-    
-    def hybrid_retrieval(self, query: str, top_k: int = 5) -> Dict[str, Any]:
-        """Perform hybrid retrieval combining vector search and graph traversal."""
+            vector_results, traversal_results = [], await self.agraph_traversal(query)
+        
+        result = self._combine_results(vector_results, traversal_results)
+        if query_vec is not None and not no_cache:
+            self._semantic_cache.put(namespace, query_vec, result)
+        return result
+    
+    def _hybrid_retrieval(self, query: str, query_vec: Optional[np.ndarray], top_k: int,
+                          label: str, no_cache: bool) -> Dict[str, Any]:
+        """Hybrid retrieval for a query whose normalized embedding is already known."""
+        namespace = (label, top_k)
+        if query_vec is not None and not no_cache:
+            cached = self._semantic_cache.get(namespace, query_vec)
+            if cached is not None:
+                return cached
+        
         # Vector search
-        vector_results = self.vector_search(query, top_k=top_k)
+        vector_results = self._search_by_vector(query_vec, top_k, label) if query_vec is not None else []
         
         # Graph traversal
         traversal_results = self.graph_traversal(query)
         
-        # Combine and deduplicate
+        result = self._combine_results(vector_results, traversal_results)
+        if query_vec is not None and not no_cache:
+            self._semantic_cache.put(namespace, query_vec, result)
+        return result
+    
+    def _combine_results(self, vector_results: List[Dict[str, Any]],
+                         traversal_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge vector and traversal hits into deduplicated nodes and context text."""
+        # Combine and deduplicate, counting each source as nodes are added
         context_nodes = {}
+        vector_count = 0
+        traversal_count = 0
         
         for result in vector_results:
             node_data = result.get("n", {})
@@ -153,6 +658,8 @@ class GraphRAGPipeline:
                 
             node_id = node.get("id") or node.get("name")
             if node_id:
+                if node_id not in context_nodes:
+                    vector_count += 1
                 context_nodes[node_id] = {
                     "node": node,
                     "similarity": result.get("similarity", 0),
@@ -178,6 +685,7 @@ class GraphRAGPipeline:
                             "similarity": 0.5,  # Default for traversal
                             "source": "traversal"
                         }
+                        traversal_count += 1
         
         # Build context text
         context_text = self._build_context(context_nodes.values())
@@ -185,8 +693,8 @@ class GraphRAGPipeline:
         return {
             "context": context_text,
             "nodes": list(context_nodes.values()),
-            "vector_count": len([n for n in context_nodes.values() if n["source"] == "vector"]),
-            "traversal_count": len([n for n in context_nodes.values() if n["source"] == "traversal"])
+            "vector_count": vector_count,
+            "traversal_count": traversal_count
         }
     
     def _build_context(self, nodes: List[Dict]) -> str:
@@ -196,31 +704,17 @@ class GraphRAGPipeline:
         for node_info in nodes:
             node = node_info.get("node", {})
             
-            # Determine node type from properties or labels
-            node_type = "Node"
-            if "nationality" in node or "born" in node:
-                if "seasons" in node or "episodes" in node:
-                    node_type = "Serie"
-                elif "year" in node or "duration" in node:
-                    node_type = "Film"
-                elif "seasons" not in node and "episodes" not in node and "year" not in node and "duration" not in node:
-                    # Check if it's Actor or Director by checking relationships
-                    node_type = "Actor"  # Default, could be Director too
-            elif "year" in node or "duration" in node:
-                node_type = "Film"
-            elif "seasons" in node or "episodes" in node:
-                node_type = "Serie"
-            elif "name" in node and "nationality" not in node and "year" not in node:
-                node_type = "Genre"
-            
-            # Extract properties
+            # Node type is the primary label projected by the retrieval queries
+            labels = node.get("_labels")
+            node_type = labels[0] if labels else "Node"
             name = node.get("name", "Unknown")
-            props = {k: v for k, v in node.items() if k not in ["embedding", "id"] and v is not None}
             
-            context_parts.append(f"{node_type}: {name}")
-            for key, value in props.items():
-                if value:
-                    context_parts.append(f"  - {key}: {value}")
+            # Skip empty values and internal properties in a single pass
+            props = "".join(
+                f"\n  - {key}: {value}"
+                for key, value in node.items()
+                if value and key not in _CONTEXT_EXCLUDED_PROPERTIES
+            )
+            context_parts.append(f"{node_type}: {name}{props}")
         
         return "\n".join(context_parts) if context_parts else "No relevant context found."
-
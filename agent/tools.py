@@ -1,13 +1,101 @@
 """Custom tools for the agent."""
+import ast
 import json
+import operator
 import re
-from typing import Dict, Any, Optional, Type
+from functools import lru_cache
+from typing import Dict, Any, Optional, Type, Union
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from agent.graphrag import GraphRAGPipeline
 from graph_db.client import Neo4jClient
 
 
+# -------------------------
+# SAFE ARITHMETIC
+# -------------------------
+
+# Anything other than digits, operators, parentheses and whitespace
+_CALC_SANITIZER = re.compile(r'[^0-9+\-*/().\s]')
+
+# Integer size bound that keeps a single expression from running for seconds; floats overflow on their own
+_MAX_INT_BITS = 4096
+
+
+def _checked(value):
+    """Pass a value through, rejecting complex results and integers beyond _MAX_INT_BITS."""
+    if isinstance(value, complex):
+        raise ValueError("complex result")
+    if isinstance(value, int) and value.bit_length() > _MAX_INT_BITS:
+        raise ValueError("number too large")
+    return value
+
+
+def _power(base, exponent):
+    """Bounded pow: integer result size is estimated before computing."""
+    if isinstance(base, int) and isinstance(exponent, int) and base.bit_length() * exponent > _MAX_INT_BITS:
+        raise ValueError("number too large")
+    return operator.pow(base, exponent)
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: _power,
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def _eval_node(node: ast.AST):
+    """Evaluate an arithmetic AST node, rejecting anything but numbers and operators."""
+    if isinstance(node, ast.Expression):
+        return _eval_node(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return _checked(node.value)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        return _checked(_BINARY_OPERATORS[type(node.op)](_eval_node(node.left), _eval_node(node.right)))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _checked(_UNARY_OPERATORS[type(node.op)](_eval_node(node.operand)))
+    raise ValueError(f"unsupported expression element: {type(node).__name__}")
+
+
+@lru_cache(maxsize=512)
+def _evaluate(expression: str):
+    """Evaluate an arithmetic expression without eval(), memoized per expression."""
+    return _eval_node(ast.parse(expression.strip(), mode="eval"))
+
+
+# A whole query that is only an arithmetic expression, optionally after "calculate" etc.
+_ARITHMETIC_QUERY_RE = re.compile(
+    r"^\s*(?:please\s+)?(?P<keyword>calculate|compute|evaluate|what\s+is|what's)?\s*:?\s*"
+    r"(?P<expression>[0-9+\-*/().^\s]*[0-9][0-9+\-*/().^\s]*?)\s*(?P<end>[?.!=])?\s*$",
+    re.IGNORECASE,
+)
+
+
+def evaluate_arithmetic_query(text: str) -> Optional[Union[int, float]]:
+    """Value of a query that is pure arithmetic (e.g. "Calculate 125 * 47 + 892"), else None."""
+    match = _ARITHMETIC_QUERY_RE.match(text)
+    # Without "calculate"-style wording or a "?"/"=", text like "1999-2005" is a range, not a sum
+    if not match or not (match.group("keyword") or match.group("end") in ("?", "=")):
+        return None
+    expression = match.group("expression").replace("^", "**")
+    # A bare number is not a calculation
+    if not re.search(r"[0-9.)]\s*[+\-*/]", expression):
+        return None
+    try:
+        return _evaluate(expression)
+    except (ValueError, SyntaxError, ArithmeticError):
+        return None
+
+
 # -------------------------
 # INPUT SCHEMAS
 # -------------------------
@@ -71,8 +159,19 @@ class GraphQueryTool(BaseTool):
             return f"Error querying graph: {str(e)}"
     
     async def _arun(self, query: str, use_vector_search: bool = True) -> str:
-        """Async version."""
-        return self._run(query, use_vector_search)
+        """Execute the graph query without blocking the event loop."""
+        try:
+            if use_vector_search:
+                result = await self._graphrag.ahybrid_retrieval(query, top_k=5)
+                return (
+                    f"Graph Context:\n{result['context']}\n\n"
+                    f"Found {len(result['nodes'])} relevant nodes."
+                )
+            else:
+                result = await self._graphrag.agraph_traversal(query)
+                return f"Graph Traversal Results: {json.dumps(result, indent=2)}"
+        except Exception as e:
+            return f"Error querying graph: {str(e)}"
 
 
 class CalculatorTool(BaseTool):
@@ -90,8 +189,8 @@ class CalculatorTool(BaseTool):
         """Evaluate the mathematical expression."""
         try:
             # Sanitize input - only allow numbers, operators, and parentheses
-            sanitized = re.sub(r'[^0-9+\-*/().\s]', '', expression)
-            result = eval(sanitized)
+            sanitized = _CALC_SANITIZER.sub('', expression)
+            result = _evaluate(sanitized)
             return f"Result: {result}"
         except Exception as e:
             return f"Error calculating: {str(e)}"
@@ -2,12 +2,19 @@
 import streamlit as st
 import os
 import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List
 from dotenv import load_dotenv
-from graph_db.client import Neo4jClient
 from graph_db.schema import GraphSchema
-from agent.graphrag import GraphRAGPipeline
-from agent.agent import AgenticAI
+from agent.prompts import SYSTEM_PROMPT
+import threading
 import time
+import uuid
+
+# The Neo4j driver, models and LangGraph are imported in initialize_system, off the first paint
+if TYPE_CHECKING:
+    from agent.agent import AgenticAI
 
 load_dotenv()
 
@@ -19,137 +26,184 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for blue theme
-st.markdown("""
-<style>
-    /* Main background gradient */
-    .stApp {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    }
-    
-    /* Sidebar styling */
-    .css-1d391kg {
-        background-color: rgba(30, 58, 138, 0.95);
-    }
-    
-    /* Header styling */
-    .main-header {
-        background: linear-gradient(135deg, #1e3a8a 0%, #3b82f6 100%);
-        padding: 2rem;
-        border-radius: 15px;
-        color: white;
-        margin-bottom: 2rem;
-        box-shadow: 0 10px 30px rgba(30, 58, 138, 0.3);
-    }
-    
-    /* Chat message styling */
-    .user-message {
-        background: linear-gradient(135deg, #3b82f6 0%, #2563eb 100%);
-        color: white;
-        padding: 1rem;
-        border-radius: 15px;
-        margin: 1rem 0;
-        box-shadow: 0 4px 15px rgba(59, 130, 246, 0.3);
-    }
-    
-    .bot-message {
-        background: white;
-        color: #1f2937;
-        padding: 1rem;
-        border-radius: 15px;
-        margin: 1rem 0;
-        border-left: 4px solid #3b82f6;
-        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-    }
-    
-    /* Tool tags */
-    .tool-tag {
-        display: inline-block;
-        background: #dbeafe;
-        color: #1e3a8a;
-        padding: 0.3rem 0.8rem;
-        border-radius: 20px;
-        font-size: 0.85rem;
-        font-weight: 600;
-        margin: 0.2rem;
-    }
-    
-    /* Stats cards */
-    .stat-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-        text-align: center;
-    }
-    
-    .stat-value {
-        font-size: 2rem;
-        font-weight: 700;
-        color: #1e3a8a;
-    }
-    
-    .stat-label {
-        color: #6b7280;
-        font-size: 0.9rem;
-        margin-top: 0.5rem;
-    }
-    
-    /* Input area */
-    .stTextInput > div > div > input {
-        background-color: white;
-        border-radius: 10px;
-    }
+# Custom CSS for blue theme (colors live in .streamlit/config.toml)
+CSS_PATH = Path(__file__).parent / "static" / "custom.css"
+
+
+@st.cache_data(show_spinner=False)
+def load_css(path: str) -> str:
+    """Read a stylesheet once and wrap it in a style tag."""
+    return f"<style>\n{Path(path).read_text(encoding='utf-8')}</style>"
+
+
+st.html(load_css(str(CSS_PATH)))
+
+
+@dataclass
+class PromptBuffer:
+    """Conversation sent to the agent, ordered for LLM prompt-prefix caching.
     
-    /* Button styling */
-    .stButton > button {
-        background: linear-gradient(135deg, #3b82f6 0%, #2563eb 100%);
-        color: white;
-        border: none;
-        border-radius: 10px;
-        padding: 0.5rem 2rem;
-        font-weight: 600;
-        transition: all 0.3s;
-    }
+    Messages are laid out as [static system][committed history][new turn].
+    Committed turns are only ever appended, so each request starts with the
+    previous request's bytes.
+    """
+    static_system: str = SYSTEM_PROMPT
+    committed: List[Dict[str, str]] = field(default_factory=list)
     
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(59, 130, 246, 0.4);
-    }
+    def build(self, user_input: str) -> List[Dict[str, str]]:
+        """Messages for the next turn."""
+        return [
+            {"role": "system", "content": self.static_system},
+            *self.committed,
+            {"role": "user", "content": user_input},
+        ]
     
-    /* Hide Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-</style>
-""", unsafe_allow_html=True)
+    def commit(self, user_input: str, response: str):
+        """Append a completed exchange to the stable history."""
+        self.committed.append({"role": "user", "content": user_input})
+        self.committed.append({"role": "assistant", "content": response})
 
 
 @st.cache_resource
 def initialize_system():
     """Initialize the agent system (cached)."""
+    from graph_db.client import Neo4jClient
+    from agent.graphrag import GraphRAGPipeline
+    from agent.agent import AgenticAI
+    
     try:
-        neo4j_client = Neo4jClient()
+        neo4j_client = Neo4jClient.instance()
         graphrag = GraphRAGPipeline(neo4j_client)
         agent = AgenticAI(graphrag)
+        # Warm Neo4j and the retrieval caches off the critical path of the first query
+        threading.Thread(target=graphrag.warmup, daemon=True).start()
         return neo4j_client, graphrag, agent, None
     except Exception as e:
         return None, None, None, str(e)
 
 
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_graph_info(_neo4j_client):
+    """Graph information, served from Streamlit's cache between reruns."""
+    # The leading underscore keeps Streamlit from hashing the driver-holding client
+    return _neo4j_client.get_graph_info()
+
+
 def get_graph_info(neo4j_client):
     """Get graph information."""
     if not neo4j_client:
         return None
     try:
-        info = neo4j_client.get_graph_info()
-        schema = GraphSchema(neo4j_client)
-        schema_info = schema.get_schema_info()
-        return {**info, "schema": schema_info}
+        # Failures raise out of the cached function, so they are not cached;
+        # the static schema is added outside it, as read-only mappings don't pickle
+        return {**_cached_graph_info(neo4j_client), "schema": GraphSchema.get_schema_info()}
     except:
         return None
 
 
+def render_tools(tools_used):
+    """Show the tools used for a reply as a caption."""
+    if tools_used:
+        st.caption(" ".join(f"`{tool}`" for tool in tools_used))
+
+
+def render_message(message):
+    """Render one chat message."""
+    avatar = "👤" if message["role"] == "user" else "🤖"
+    with st.chat_message(message["role"], avatar=avatar):
+        st.markdown(message["content"])
+        render_tools(message.get("tools_used"))
+
+
+def queue_query(query: str):
+    """Queue a query for the chat panel, tagged with a one-time dispatch token."""
+    st.session_state.pending_query = {"id": uuid.uuid4().hex, "text": query}
+
+
+@st.fragment
+def chat_panel(agent: "AgenticAI"):
+    """Chat history and input, re-executed on its own when the user sends a message."""
+    st.markdown("### 💬 Chat with the Agent")
+    
+    # Clear chat before rendering, so no rerun is needed to show the reset history
+    if st.button("🗑️ Clear Chat", use_container_width=True):
+        st.session_state.messages = [
+            {
+                "role": "assistant",
+                "content": "Chat cleared! How can I help you?",
+                "tools_used": []
+            }
+        ]
+        st.session_state.buffer = PromptBuffer()
+    
+    # Initialize session state
+    if "buffer" not in st.session_state:
+        st.session_state.buffer = PromptBuffer()
+    if "messages" not in st.session_state:
+        st.session_state.messages = [
+            {
+                "role": "assistant",
+                "content": "Hello! I'm your Agentic AI assistant. I can help you query the knowledge graph about films and series, perform calculations, and search for information. Try asking me about actors, directors, films, series, genres, or ask me to calculate something!",
+                "tools_used": []
+            }
+        ]
+    
+    # Display chat history
+    chat_container = st.container()
+    with chat_container:
+        for message in st.session_state.messages:
+            render_message(message)
+    
+    # Single dispatcher for typed input and example queries clicked in the sidebar
+    user_input = st.chat_input("Type your question here...")
+    if user_input:
+        queue_query(user_input)
+    pending = st.session_state.pop("pending_query", None)
+    
+    # Each dispatch carries a token, so a message is never processed twice
+    if not pending or pending["id"] == st.session_state.get("last_dispatch_id"):
+        return
+    st.session_state.last_dispatch_id = pending["id"]
+    query_to_process = pending["text"]
+    
+    # New messages are rendered as they are appended, so no rerun is needed
+    user_message = {"role": "user", "content": query_to_process}
+    st.session_state.messages.append(user_message)
+    with chat_container:
+        render_message(user_message)
+        
+        # Stream tokens into the assistant message as they arrive
+        with st.chat_message("assistant", avatar="🤖"):
+            try:
+                # Query the agent with the conversation so far
+                result = {}
+                placeholder = st.empty()
+                streamed = placeholder.write_stream(agent.stream(st.session_state.buffer.build(query_to_process), result))
+                response = result.get("response") or streamed or "No response generated."
+                # Text streamed before a call turned into a tool selection is not part of the answer
+                if response != streamed:
+                    placeholder.markdown(response)
+                st.session_state.buffer.commit(query_to_process, response)
+                
+                # Add assistant response
+                assistant_message = {
+                    "role": "assistant",
+                    "content": response,
+                    "tools_used": result.get("tools_used", [])
+                }
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+                assistant_message = {
+                    "role": "assistant",
+                    "content": f"Sorry, I encountered an error: {str(e)}",
+                    "tools_used": []
+                }
+                st.markdown(assistant_message["content"])
+            render_tools(assistant_message["tools_used"])
+    
+    st.session_state.messages.append(assistant_message)
+
+
 def main():
     """Main Streamlit app."""
     
@@ -205,119 +259,16 @@ def main():
         ]
         
         for query in example_queries:
-            if st.button(f"💬 {query}", key=f"example_{query}", use_container_width=True):
-                st.session_state.user_query = query
-    
-    # Main chat area
-    st.markdown("### 💬 Chat with the Agent")
+            st.button(
+                f"💬 {query}",
+                key=f"example_{query}",
+                use_container_width=True,
+                on_click=queue_query,
+                args=(query,),
+            )
     
-    # Initialize session state
-    if "messages" not in st.session_state:
-        st.session_state.messages = [
-            {
-                "role": "assistant",
-                "content": "Hello! I'm your Agentic AI assistant. I can help you query the knowledge graph about films and series, perform calculations, and search for information. Try asking me about actors, directors, films, series, genres, or ask me to calculate something!",
-                "tools_used": []
-            }
-        ]
-    
-    # Display chat history
-    chat_container = st.container()
-    with chat_container:
-        for message in st.session_state.messages:
-            if message["role"] == "user":
-                st.markdown(f"""
-                <div class="user-message">
-                    <strong>👤 You:</strong><br>
-                    {message["content"]}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                tools_html = ""
-                if message.get("tools_used"):
-                    tools_html = "<div style='margin-top: 0.5rem;'>"
-                    for tool in message["tools_used"]:
-                        tools_html += f'<span class="tool-tag">{tool}</span>'
-                    tools_html += "</div>"
-                
-                st.markdown(f"""
-                <div class="bot-message">
-                    <strong>🤖 Assistant:</strong><br>
-                    {message["content"]}
-                    {tools_html}
-                </div>
-                """, unsafe_allow_html=True)
-    
-    # Input area
-    st.markdown("---")
-    
-    # Get query from input or session state
-    query = ""
-    if "user_query" in st.session_state:
-        query = st.session_state.user_query
-        del st.session_state.user_query
-    
-    user_input = st.text_input(
-        "Type your question here...",
-        value=query,
-        key="input",
-        label_visibility="collapsed"
-    )
-    
-    col1, col2 = st.columns([2, 10])
-    with col1:
-        send_button = st.button("🚀 Send", type="primary", use_container_width=True)
-    
-    # Process query
-    if (send_button and user_input) or ("user_query" in st.session_state and st.session_state.user_query):
-        query_to_process = user_input if user_input else st.session_state.get("user_query", "")
-        
-        if query_to_process:
-            # Clear the session state query if it was set
-            if "user_query" in st.session_state:
-                del st.session_state.user_query
-            
-            # Add user message
-            st.session_state.messages.append({
-                "role": "user",
-                "content": query_to_process
-            })
-            
-            # Show processing
-            with st.spinner("🤔 Thinking..."):
-                try:
-                    # Query the agent
-                    result = agent.query(query_to_process)
-                    
-                    # Add assistant response
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": result.get("response", "No response generated."),
-                        "tools_used": result.get("tools_used", [])
-                    })
-                    
-                    # Rerun to show new messages
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": f"Sorry, I encountered an error: {str(e)}",
-                        "tools_used": []
-                    })
-                    st.rerun()
-    
-    # Clear chat button
-    if st.button("🗑️ Clear Chat", use_container_width=True):
-        st.session_state.messages = [
-            {
-                "role": "assistant",
-                "content": "Chat cleared! How can I help you?",
-                "tools_used": []
-            }
-        ]
-        st.rerun()
+    # Main chat area; reruns of the fragment leave the sidebar untouched
+    chat_panel(agent)
 
 
 if __name__ == "__main__":
@@ -1,38 +1,223 @@
 """Neo4j database client and connection management."""
+import asyncio
 import os
-from typing import Optional, List, Dict, Any
-from neo4j import GraphDatabase as Neo4jGraphDatabase
+import re
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Final, Iterator, List, Optional
+from neo4j import AsyncGraphDatabase, AsyncResult, AsyncTransaction, GraphDatabase as Neo4jGraphDatabase, Result, RoutingControl, Transaction
 from dotenv import load_dotenv
+from graph_db.schema import ENTITY_LABEL
 
 load_dotenv()
 
+# Graph labels as shown to users; the shared entity label is an implementation detail
+_NODE_TYPES_QUERY: Final = f"CALL db.labels() YIELD label WHERE label <> '{ENTITY_LABEL}' RETURN collect(label)"
+
+# Graph counts and schema in a single round-trip
+_GRAPH_INFO_QUERY: Final = f"""
+CALL {{ MATCH (n) RETURN count(n) AS node_count }}
+CALL {{ MATCH ()-[r]->() RETURN count(r) AS relationship_count }}
+CALL {{ {_NODE_TYPES_QUERY} AS node_types }}
+CALL {{ CALL db.relationshipTypes() YIELD relationshipType RETURN collect(relationshipType) AS relationship_types }}
+RETURN node_count, relationship_count, node_types, relationship_types
+"""
+
+# One query per metadata field, for servers or roles that reject the combined query
+_GRAPH_INFO_FALLBACK_QUERIES: Final = {
+    "node_count": "MATCH (n) RETURN count(n) AS value",
+    "relationship_count": "MATCH ()-[r]->() RETURN count(r) AS value",
+    "node_types": f"{_NODE_TYPES_QUERY} AS value",
+    "relationship_types": "CALL db.relationshipTypes() YIELD relationshipType RETURN collect(relationshipType) AS value",
+}
+
+
+# Labels a vector index may be created on
+VECTOR_INDEX_LABELS: Final = (ENTITY_LABEL, "Film", "Serie", "Actor", "Director", "Genre")
+
+_IDENTIFIER_RE: Final = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+@lru_cache(maxsize=32)
+def _vector_index_ddl(index_name: str, label: str, dimensions: int = 384) -> str:
+    """CREATE VECTOR INDEX statement, composed once per (index, label, dimensions)."""
+    # Schema commands cannot take names or options as parameters, so validate before composing
+    if not _IDENTIFIER_RE.fullmatch(index_name):
+        raise ValueError(f"Invalid vector index name: {index_name!r}")
+    if label not in VECTOR_INDEX_LABELS:
+        raise ValueError(f"Unsupported label for vector index: {label!r}")
+    if not isinstance(dimensions, int) or dimensions <= 0:
+        raise ValueError(f"Invalid vector dimensions: {dimensions!r}")
+    return f"""
+    CREATE VECTOR INDEX {index_name} IF NOT EXISTS
+    FOR (n:{label})
+    ON n.embedding
+    OPTIONS {{
+        indexConfig: {{
+            `vector.dimensions`: {dimensions},
+            `vector.similarity_function`: 'cosine'
+        }}
+    }}
+    """
+
+
+def _single_record(result) -> Optional[Dict[str, Any]]:
+    """Result transformer returning the first record as a dict, or None."""
+    record = result.single(strict=False)
+    return dict(record) if record is not None else None
+
+
+async def _asingle_record(result) -> Optional[Dict[str, Any]]:
+    """Async version of _single_record."""
+    record = await result.single(strict=False)
+    return dict(record) if record is not None else None
+
+
+# Sync drivers shared by every client with the same connection settings: key -> [driver, refcount]
+_shared_drivers: Dict[tuple, list] = {}
+_shared_drivers_lock = threading.Lock()
+
 
 class Neo4jClient:
     """Client for interacting with Neo4j database."""
     
-    def __init__(self):
+    _instance: Optional["Neo4jClient"] = None
+    _instance_lock = threading.Lock()
+    
+    @classmethod
+    def instance(cls) -> "Neo4jClient":
+        """Process-wide shared client; its driver is thread-safe and pooled."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+    
+    def __init__(self, pool_size: Optional[int] = None):
         self.uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
         self.user = os.getenv("NEO4J_USER", "neo4j")
         self.password = os.getenv("NEO4J_PASSWORD", "password")
+        self.database = os.getenv("NEO4J_DATABASE", "neo4j")
+        # Shared by the sync and async drivers' connection pools
+        self.pool_config = {
+            "max_connection_pool_size": pool_size or int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "50")),
+            "connection_acquisition_timeout": 30,
+        }
         self.driver = None
+        # Event loop -> (async driver, lifetime generator that closes it at loop shutdown)
+        self._async_drivers: Dict[asyncio.AbstractEventLoop, tuple] = {}
+        self._async_drivers_lock = threading.Lock()
         self._connect()
     
+    def _driver_key(self) -> tuple:
+        """Connection settings that identify a shareable driver."""
+        return (self.uri, self.user, self.password, self.pool_config["max_connection_pool_size"])
+    
     def _connect(self):
-        """Establish connection to Neo4j."""
+        """Establish connection to Neo4j, reusing an open driver with the same settings."""
+        key = self._driver_key()
+        with _shared_drivers_lock:
+            shared = _shared_drivers.get(key)
+            if shared is not None:
+                shared[1] += 1
+                self.driver = shared[0]
+                return
+            
+            try:
+                self.driver = Neo4jGraphDatabase.driver(
+                    self.uri, auth=(self.user, self.password), **self.pool_config
+                )
+                # Verify connection
+                self.driver.execute_query("RETURN 1", database_=self.database)
+                print(f"✅ Connected to Neo4j at {self.uri}")
+            except Exception as e:
+                if self.driver:
+                    self.driver.close()
+                    self.driver = None
+                print(f"❌ Failed to connect to Neo4j: {e}")
+                raise
+            _shared_drivers[key] = [self.driver, 1]
+    
+    def _release_driver(self):
+        """Drop this client's reference to the shared driver, closing it with the last one."""
+        with _shared_drivers_lock:
+            shared = _shared_drivers.get(self._driver_key())
+            if shared is not None and shared[0] is self.driver:
+                shared[1] -= 1
+                if shared[1] > 0:
+                    return
+                del _shared_drivers[self._driver_key()]
+            self.driver.close()
+    
+    def _get_async_driver(self):
+        """Async driver for the running event loop, created on first use."""
+        # Async connections are bound to the loop that opened them, so each loop gets its own driver
+        loop = asyncio.get_running_loop()
+        with self._async_drivers_lock:
+            entry = self._async_drivers.get(loop)
+            if entry is None:
+                driver = AsyncGraphDatabase.driver(
+                    self.uri, auth=(self.user, self.password), **self.pool_config
+                )
+                entry = self._async_drivers[loop] = (driver, self._close_at_shutdown(loop, driver))
+        return entry[0]
+    
+    def _close_at_shutdown(self, loop: asyncio.AbstractEventLoop, driver) -> AsyncIterator[None]:
+        """Park an async generator on the loop whose cleanup closes the driver.
+        
+        loop.shutdown_asyncgens(), which asyncio.run calls before closing the
+        loop, finalizes it, so the pool is closed on its own loop.
+        """
+        async def lifetime():
+            try:
+                yield
+            finally:
+                await self._aclose_loop_driver(loop, driver)
+        
+        generator = lifetime()
+        asyncio.ensure_future(generator.__anext__())
+        return generator
+    
+    async def _aclose_loop_driver(self, loop: asyncio.AbstractEventLoop, driver):
+        """Close a loop's async driver once, dropping it from the per-loop table."""
+        with self._async_drivers_lock:
+            if self._async_drivers.get(loop, (None,))[0] is not driver:
+                return
+            del self._async_drivers[loop]
+        await driver.close()
+    
+    async def averify_connectivity(self) -> bool:
+        """True if the server is reachable from the async driver's pool."""
         try:
-            self.driver = Neo4jGraphDatabase.driver(self.uri, auth=(self.user, self.password))
-            # Verify connection
-            with self.driver.session() as session:
-                session.run("RETURN 1")
-            print(f"✅ Connected to Neo4j at {self.uri}")
-        except Exception as e:
-            print(f"❌ Failed to connect to Neo4j: {e}")
-            raise
+            await self._get_async_driver().verify_connectivity()
+            return True
+        except Exception:
+            return False
     
     def close(self):
         """Close the database connection."""
         if self.driver:
-            self.driver.close()
+            self._release_driver()
+            self.driver = None
+        # A closed shared client is replaced on the next instance() call
+        if Neo4jClient._instance is self:
+            Neo4jClient._instance = None
+    
+    async def aclose_async_driver(self):
+        """Close only the running loop's async driver, e.g. before the loop ends."""
+        loop = asyncio.get_running_loop()
+        with self._async_drivers_lock:
+            entry = self._async_drivers.get(loop)
+        if entry is not None:
+            driver, lifetime = entry
+            await self._aclose_loop_driver(loop, driver)
+            await lifetime.aclose()
+    
+    async def aclose(self):
+        """Close the sync and async database connections."""
+        await self.aclose_async_driver()
+        self.close()
     
     def execute_query(self, query: str, parameters: Optional[Dict] = None) -> List[Dict[str, Any]]:
         """Execute a Cypher query and return results."""
@@ -40,48 +225,145 @@ class Neo4jClient:
             parameters = {}
         
         try:
-            with self.driver.session() as session:
-                result = session.run(query, parameters)
-                records = []
-                for record in result:
-                    records.append(dict(record))
-                return records
+            # Managed transaction on a pooled connection; no per-call session setup
+            return self.driver.execute_query(
+                query,
+                parameters_=parameters,
+                database_=self.database,
+                result_transformer_=Result.data,
+            )
         except Exception as e:
             print(f"Error executing query: {e}")
             return []
     
-    def get_graph_info(self) -> Dict[str, Any]:
-        """Get metadata about the knowledge graph."""
-        node_count_query = "MATCH (n) RETURN count(n) as count"
-        rel_count_query = "MATCH ()-[r]->() RETURN count(r) as count"
-        node_types_query = "CALL db.labels() YIELD label RETURN collect(label) as labels"
-        rel_types_query = "CALL db.relationshipTypes() YIELD relationshipType RETURN collect(relationshipType) as types"
+    def fetch_one(self, query: str, parameters: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """Execute a read-only Cypher query and return its first record, if any."""
+        if parameters is None:
+            parameters = {}
+        
+        try:
+            # Read transaction, so clusters may route it to a reader
+            return self.driver.execute_query(
+                query,
+                parameters_=parameters,
+                routing_=RoutingControl.READ,
+                database_=self.database,
+                result_transformer_=_single_record,
+            )
+        except Exception as e:
+            print(f"Error executing query: {e}")
+            return None
+    
+    async def aexecute_query(self, query: str, parameters: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """Execute a Cypher query on the async driver and return results."""
+        if parameters is None:
+            parameters = {}
+        
+        try:
+            return await self._get_async_driver().execute_query(
+                query,
+                parameters_=parameters,
+                database_=self.database,
+                result_transformer_=AsyncResult.data,
+            )
+        except Exception as e:
+            print(f"Error executing query: {e}")
+            return []
+    
+    def execute_statements(self, statements: List[str]) -> List[str]:
+        """Run several Cypher statements over one session, each committed on its own.
         
-        node_count = self.execute_query(node_count_query)[0].get("count", 0)
-        rel_count = self.execute_query(rel_count_query)[0].get("count", 0)
-        node_types = self.execute_query(node_types_query)[0].get("labels", [])
-        rel_types = self.execute_query(rel_types_query)[0].get("types", [])
+        A failing statement does not roll back the others; the failed
+        statements are returned.
+        """
+        failed = []
+        with self.driver.session(database=self.database) as session:
+            for statement in statements:
+                try:
+                    session.run(statement).consume()
+                except Exception as e:
+                    print(f"Error executing statement `{statement}`: {e}")
+                    failed.append(statement)
+        return failed
+    
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        """Explicit write transaction: committed on exit, rolled back if the block raises."""
+        with self.driver.session(database=self.database) as session:
+            with session.begin_transaction() as tx:
+                yield tx
+                tx.commit()
+    
+    @asynccontextmanager
+    async def atransaction(self) -> AsyncIterator[AsyncTransaction]:
+        """Async version of transaction."""
+        async with self._get_async_driver().session(database=self.database) as session:
+            async with await session.begin_transaction() as tx:
+                yield tx
+                await tx.commit()
+    
+    async def afetch_one(self, query: str, parameters: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """Async version of fetch_one."""
+        if parameters is None:
+            parameters = {}
         
+        try:
+            return await self._get_async_driver().execute_query(
+                query,
+                parameters_=parameters,
+                routing_=RoutingControl.READ,
+                database_=self.database,
+                result_transformer_=_asingle_record,
+            )
+        except Exception as e:
+            print(f"Error executing query: {e}")
+            return None
+    
+    def get_graph_info(self) -> Dict[str, Any]:
+        """Get metadata about the knowledge graph; raises RuntimeError if it cannot be read."""
+        info = self.fetch_one(_GRAPH_INFO_QUERY)
+        if info is None:
+            info = {
+                key: self.fetch_one(query)
+                for key, query in _GRAPH_INFO_FALLBACK_QUERIES.items()
+            }
+            info = self._fallback_graph_info(info)
+        return self._graph_info(info)
+    
+    async def aget_graph_info(self) -> Dict[str, Any]:
+        """Async version of get_graph_info; fallback queries run concurrently."""
+        info = await self.afetch_one(_GRAPH_INFO_QUERY)
+        if info is None:
+            records = await asyncio.gather(
+                *(self.afetch_one(query) for query in _GRAPH_INFO_FALLBACK_QUERIES.values())
+            )
+            info = self._fallback_graph_info(dict(zip(_GRAPH_INFO_FALLBACK_QUERIES, records)))
+        return self._graph_info(info)
+    
+    @staticmethod
+    def _fallback_graph_info(records: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Merge the per-field fallback records, skipping failed ones; raises if all failed."""
+        info = {key: record["value"] for key, record in records.items() if record is not None}
+        # Every query failing means the database is unreachable, not that the graph is empty
+        if not info:
+            raise RuntimeError("Graph info unavailable: all metadata queries failed")
+        return info
+    
+    @staticmethod
+    def _graph_info(info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Graph metadata from the _GRAPH_INFO_QUERY record."""
+        info = info or {}
         return {
-            "node_count": node_count,
-            "relationship_count": rel_count,
-            "node_types": node_types,
-            "relationship_types": rel_types
+            "node_count": info.get("node_count", 0),
+            "relationship_count": info.get("relationship_count", 0),
+            "node_types": info.get("node_types", []),
+            "relationship_types": info.get("relationship_types", [])
         }
     
-    def create_vector_index(self, index_name: str = "embeddings", label: str = "Node"):
-        """Create a vector index for embeddings."""
-        query = f"""
-        CREATE VECTOR INDEX {index_name} IF NOT EXISTS
-        FOR (n:{label})
-        ON n.embedding
-        OPTIONS {{
-            indexConfig: {{
-                `vector.dimensions`: 384,
-                `vector.similarity_function`: 'cosine'
-            }}
-        }}
-        """
+    def create_vector_index(self, index_name: str = "entity_embeddings", label: str = ENTITY_LABEL):
+        """Create a vector index for embeddings (by default over every node, via the shared label)."""
+        # Raises ValueError for names or labels that are not allowed
+        query = _vector_index_ddl(index_name, label)
         try:
             self.execute_query(query)
             print(f"✅ Created vector index: {index_name}")
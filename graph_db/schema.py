@@ -1,49 +1,72 @@
 """Neo4j graph schema definition and constraints."""
-from graph_db.client import Neo4jClient
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Final, List, Mapping
+
+if TYPE_CHECKING:
+    from graph_db.client import Neo4jClient
+
+# Full-text (Lucene) index over node names, queried by generic graph traversal
+FULLTEXT_INDEX = "node_names"
+
+# Secondary label on every node, so a single unique id index serves lookups across labels
+ENTITY_LABEL = "Entity"
+
+# Unique id constraints; bulk relationship loads rely on them for indexed MATCH lookups
+_ID_CONSTRAINTS: Final = ("actor_id", "director_id", "film_id", "serie_id", "genre_id", "entity_id")
+
+# Unique constraints and indexes, each created independently of the others
+_CONSTRAINTS = [
+    "CREATE CONSTRAINT actor_id IF NOT EXISTS FOR (a:Actor) REQUIRE a.id IS UNIQUE",
+    "CREATE CONSTRAINT director_id IF NOT EXISTS FOR (d:Director) REQUIRE d.id IS UNIQUE",
+    "CREATE CONSTRAINT film_id IF NOT EXISTS FOR (f:Film) REQUIRE f.id IS UNIQUE",
+    "CREATE CONSTRAINT serie_id IF NOT EXISTS FOR (s:Serie) REQUIRE s.id IS UNIQUE",
+    "CREATE CONSTRAINT genre_id IF NOT EXISTS FOR (g:Genre) REQUIRE g.id IS UNIQUE",
+    f"CREATE CONSTRAINT entity_id IF NOT EXISTS FOR (n:{ENTITY_LABEL}) REQUIRE n.id IS UNIQUE",
+    f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} IF NOT EXISTS "
+    "FOR (n:Film|Serie|Actor|Director|Genre) ON EACH [n.name]",
+]
+
+# Static description of the graph schema, built once and read-only
+_SCHEMA_INFO: Final[Mapping] = MappingProxyType({
+    "node_labels": ("Film", "Serie", "Actor", "Director", "Genre"),
+    "relationships": (
+        "JOUE_DANS",
+        "REALISE",
+        "APPARTIENT_A_GENRE",
+        "A_JOUÉ_AVEC"
+    ),
+    "properties": MappingProxyType({
+        "Film": ("id", "name", "year", "duration", "rating", "embedding"),
+        "Serie": ("id", "name", "seasons", "episodes", "rating", "embedding"),
+        "Actor": ("id", "name", "nationality", "born", "embedding"),
+        "Director": ("id", "name", "nationality", "born", "embedding"),
+        "Genre": ("id", "name", "embedding")
+    })
+})
 
 
 class GraphSchema:
     """Manages the knowledge graph schema."""
     
-    def __init__(self, client: Neo4jClient):
+    def __init__(self, client: "Neo4jClient"):
         self.client = client
     
     def create_constraints(self):
         """Create unique constraints and indexes."""
-        constraints = [
-            "CREATE CONSTRAINT actor_id IF NOT EXISTS FOR (a:Actor) REQUIRE a.id IS UNIQUE",
-            "CREATE CONSTRAINT director_id IF NOT EXISTS FOR (d:Director) REQUIRE d.id IS UNIQUE",
-            "CREATE CONSTRAINT film_id IF NOT EXISTS FOR (f:Film) REQUIRE f.id IS UNIQUE",
-            "CREATE CONSTRAINT serie_id IF NOT EXISTS FOR (s:Serie) REQUIRE s.id IS UNIQUE",
-            "CREATE CONSTRAINT genre_id IF NOT EXISTS FOR (g:Genre) REQUIRE g.id IS UNIQUE",
-        ]
-        
-        for constraint in constraints:
-            try:
-                self.client.execute_query(constraint)
-            except Exception as e:
-                print(f"Note: Constraint may already exist: {e}")
-        
-        print("✅ Graph constraints created")
+        # One session, one commit per statement; IF NOT EXISTS keeps reruns safe
+        failed = self.client.execute_statements(_CONSTRAINTS)
+        if not failed:
+            print("✅ Graph constraints created")
+        for statement in failed:
+            print(f"Note: Could not create: {statement}")
     
-    def get_schema_info(self) -> dict:
-        """Get information about the graph schema."""
-        return {
-            "node_labels": ["Film", "Serie", "Actor", "Director", "Genre"],
-            "relationships": [
-                "JOUE_DANS",
-                "REALISE",
-                "APPARTIENT_A_GENRE",
-                "A_JOUÉ_AVEC"
-            ],
-            "properties": {
-                "Film": ["id", "name", "year", "duration", "rating", "embedding"],
-                "Serie": ["id", "name", "seasons", "episodes", "rating", "embedding"],
-                "Actor": ["id", "name", "nationality", "born", "embedding"],
-                "Director": ["id", "name", "nationality", "born", "embedding"],
-                "Genre": ["id", "name", "embedding"]
-            }
-        }
-
-
-
+    def missing_constraints(self) -> List[str]:
+        """Names of the unique id constraints not present in the database."""
+        existing = self.client.fetch_one("SHOW CONSTRAINTS YIELD name RETURN collect(name) AS names")
+        names = set(existing["names"]) if existing else set()
+        return [name for name in _ID_CONSTRAINTS if name not in names]
+    
+    @staticmethod
+    def get_schema_info() -> Mapping:
+        """Get information about the graph schema (a read-only mapping)."""
+        return _SCHEMA_INFO
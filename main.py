@@ -1,13 +1,19 @@
 """FastAPI backend for the Agentic AI system."""
+import asyncio
 import os
+from typing import TYPE_CHECKING, Optional
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from graph_db.client import Neo4jClient
 from graph_db.schema import GraphSchema
-from agent.graphrag import GraphRAGPipeline
-from agent.agent import AgenticAI
+
+# Heavy modules (Neo4j driver, models, LangGraph) are imported in startup_event
+if TYPE_CHECKING:
+    from graph_db.client import Neo4jClient
+    from agent.graphrag import GraphRAGPipeline
+    from agent.agent import AgenticAI
 
 load_dotenv()
 
@@ -26,21 +32,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON payloads (graph info lists, long answers)
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
 # Initialize components
-neo4j_client = None
-graphrag = None
-agent = None
+neo4j_client: Optional["Neo4jClient"] = None
+graphrag: Optional["GraphRAGPipeline"] = None
+agent: Optional["AgenticAI"] = None
+
+# Seconds between background Neo4j connectivity checks
+LIVENESS_INTERVAL = 10.0
+
+
+async def _liveness_loop():
+    """Refresh app.state.neo4j_alive periodically, so health probes never touch Bolt."""
+    while True:
+        await asyncio.sleep(LIVENESS_INTERVAL)
+        app.state.neo4j_alive = await neo4j_client.averify_connectivity()
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup."""
     global neo4j_client, graphrag, agent
+    from graph_db.client import Neo4jClient
+    from agent.graphrag import GraphRAGPipeline
+    from agent.agent import AgenticAI
     
     try:
-        neo4j_client = Neo4jClient()
+        neo4j_client = Neo4jClient.instance()
+        # Constraints and indexes are ensured once, before traffic is accepted
+        GraphSchema(neo4j_client).create_constraints()
         graphrag = GraphRAGPipeline(neo4j_client)
         agent = AgenticAI(graphrag)
+        app.state.neo4j_alive = await neo4j_client.averify_connectivity()
+        app.state.liveness_task = asyncio.create_task(_liveness_loop())
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(graphrag.warmup))
         print("✅ Agentic AI system initialized")
     except Exception as e:
         print(f"❌ Failed to initialize system: {e}")
@@ -51,8 +78,11 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown."""
     global neo4j_client
+    liveness_task = getattr(app.state, "liveness_task", None)
+    if liveness_task:
+        liveness_task.cancel()
     if neo4j_client:
-        neo4j_client.close()
+        await neo4j_client.aclose()
 
 
 class QueryRequest(BaseModel):
@@ -75,7 +105,8 @@ async def ask_question(request: QueryRequest):
         raise HTTPException(status_code=503, detail="Agent not initialized")
     
     try:
-        result = agent.query(request.query)
+        # Async graph run: LLM calls and Neo4j I/O don't block the event loop
+        result = await agent.aquery(request.query)
         return QueryResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
@@ -88,31 +119,39 @@ async def get_graph_info():
         raise HTTPException(status_code=503, detail="Neo4j client not initialized")
     
     try:
-        info = neo4j_client.get_graph_info()
-        schema = GraphSchema(neo4j_client)
-        schema_info = schema.get_schema_info()
+        info = await neo4j_client.aget_graph_info()
         
         return {
             **info,
-            "schema": schema_info
+            "schema": GraphSchema.get_schema_info()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting graph info: {str(e)}")
 
 
-@app.get("/health")
+@app.api_route("/health", methods=["GET", "HEAD"])
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint; reads cached liveness, no database I/O."""
     return {
         "status": "healthy",
-        "neo4j_connected": neo4j_client is not None,
+        "neo4j_connected": getattr(app.state, "neo4j_alive", False),
         "agent_ready": agent is not None
     }
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Import string so each worker process builds its own app and Neo4j driver at startup;
+    # "auto" picks uvloop/httptools when installed (uvicorn[standard])
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        # Each worker loads its own embedding model, caches and Neo4j pool, so scale out explicitly
+        workers=int(os.getenv("WORKERS", "1")),
+        loop="auto",
+        http="auto",
+    )
 
 
 
@@ -1,285 +1,194 @@
 """Script to initialize Neo4j knowledge graph with sample data."""
+import asyncio
+import csv
 import sys
 import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+from neo4j import Transaction
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from graph_db.client import Neo4jClient
-from graph_db.schema import GraphSchema
+from graph_db.schema import ENTITY_LABEL, GraphSchema
+from agent.embeddings import quantize_int8
 from agent.graphrag import GraphRAGPipeline
 
+# EMBEDDING_STORAGE=int8 stores only the INT8 copy: a quarter of the payload, but no vector index
+INT8_ONLY = os.getenv("EMBEDDING_STORAGE", "fp32+int8").lower() == "int8"
+
+# Sample data lives in CSV files; numeric columns are typed on load
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+_COLUMN_TYPES = {"year": int, "duration": int, "rating": float, "seasons": int, "episodes": int, "born": int}
+
+# Node CSVs: (label, file, embedding text template over the row's columns)
+SAMPLE_NODES = [
+    ("Film", "films.csv", "{name} film {year}"),
+    ("Serie", "series.csv", "{name} series {seasons} seasons"),
+    ("Actor", "actors.csv", "{name} actor {nationality}"),
+    ("Director", "directors.csv", "{name} director {nationality}"),
+    ("Genre", "genres.csv", "{name} genre"),
+]
+
+
+def read_sample_csv(filename: str) -> List[Dict]:
+    """Rows of a sample data CSV, with numeric columns converted."""
+    with open(DATA_DIR / filename, newline="", encoding="utf-8") as f:
+        return [
+            {column: _COLUMN_TYPES.get(column, str)(value) for column, value in row.items()}
+            for row in csv.DictReader(f)
+        ]
+
+
+def read_sample_relationships(filename: str = "relationships.csv") -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """Relationship CSV grouped by type as (type, [(start id, end id), ...]), in file order."""
+    # Endpoints are matched on the shared Entity label, so labels do not split the batches
+    groups: Dict[str, List[Tuple[str, str]]] = {}
+    with open(DATA_DIR / filename, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            groups.setdefault(row["rel_type"], []).append((row["start_id"], row["end_id"]))
+    return list(groups.items())
+
+
+def read_sample_nodes(label: str, filename: str, text_template: str) -> Tuple[str, List[Dict], List[str]]:
+    """A node CSV as (label, rows, embedding text per row)."""
+    rows = read_sample_csv(filename)
+    return label, rows, [text_template.format(**row) for row in rows]
+
+
+# Node rows and their embedding texts, read and formatted once at import
+SAMPLE_NODE_DATA = [read_sample_nodes(*spec) for spec in SAMPLE_NODES]
+SAMPLE_RELATIONSHIPS = read_sample_relationships()
+
+# Local path of the Neo4j server's import directory; when set, nodes are loaded with LOAD CSV
+NEO4J_IMPORT_DIR = os.getenv("NEO4J_IMPORT_DIR")
+
+
+def embedding_params(embedding: np.ndarray) -> dict:
+    """FP32 embedding (for the vector index) plus its INT8 copy (for retrieval)."""
+    embedding_q8, embedding_scale = quantize_int8(embedding)
+    params = {"embedding_q8": embedding_q8, "embedding_scale": embedding_scale}
+    if not INT8_ONLY:
+        params["embedding"] = embedding.tolist()
+    return params
+
+
+def unwind_nodes_statement(label: str, rows: List[Dict], embeddings: np.ndarray) -> Tuple[str, Dict]:
+    """Cypher and parameters creating all nodes of a label in a single UNWIND round-trip."""
+    rows = [{**row, **embedding_params(embedding)} for row, embedding in zip(rows, embeddings)]
+    query = f"""
+    UNWIND $rows AS row
+    CREATE (n:{label}:{ENTITY_LABEL})
+    SET n = row
+    """
+    return query, {"rows": rows}
+
+
+def load_csv_nodes_statement(label: str, rows: List[Dict], embeddings: np.ndarray,
+                             import_dir: str) -> Tuple[str, Dict]:
+    """Write a label's rows to the server import directory and return the LOAD CSV creating them."""
+    filename = f"{label.lower()}_nodes.csv"
+    columns = list(rows[0]) if rows else ["id"]
+    with open(Path(import_dir) / filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([*columns, "embedding"])
+        for row, embedding in zip(rows, embeddings):
+            writer.writerow([*(row[column] for column in columns), ";".join(map(repr, embedding.tolist()))])
+    
+    # LOAD CSV yields strings, so typed columns and the vector are converted server-side
+    conversions = "".join(
+        f", n.{column} = {'toInteger' if _COLUMN_TYPES[column] is int else 'toFloat'}(row.{column})"
+        for column in columns if column in _COLUMN_TYPES
+    )
+    query = f"""
+    LOAD CSV WITH HEADERS FROM 'file:///{filename}' AS row
+    CREATE (n:{label}:{ENTITY_LABEL})
+    SET n = row{conversions}, n.embedding = [x IN split(row.embedding, ';') | toFloat(x)]
+    """
+    return query, {}
+
+
+async def acreate_nodes(client: Neo4jClient, graphrag: GraphRAGPipeline, label: str,
+                        rows: List[Dict], texts: List[str]):
+    """Embed and create all nodes of a label in its own async transaction."""
+    # One batched forward pass per label, in a worker thread so it overlaps other labels' writes
+    embeddings = await asyncio.to_thread(graphrag.get_embeddings, texts, 64)
+    # The INT8 copy is bytes, which LOAD CSV cannot produce, so INT8-only storage goes through UNWIND
+    if NEO4J_IMPORT_DIR and not INT8_ONLY:
+        query, params = load_csv_nodes_statement(label, rows, embeddings, NEO4J_IMPORT_DIR)
+    else:
+        query, params = unwind_nodes_statement(label, rows, embeddings)
+    
+    async with client.atransaction() as tx:
+        result = await tx.run(query, params)
+        await result.consume()
+
+
+def bulk_create_relationships(tx: Transaction, rel_type: str, pairs: List[Tuple[str, str]]):
+    """Create all relationships of a type between nodes matched by id, in a single round-trip."""
+    query = f"""
+    UNWIND $pairs AS pair
+    MATCH (a:{ENTITY_LABEL} {{id: pair[0]}}), (b:{ENTITY_LABEL} {{id: pair[1]}})
+    CREATE (a)-[:{rel_type}]->(b)
+    """
+    tx.run(query, {"pairs": pairs}).consume()
+
+
+def has_apoc(client: Neo4jClient) -> bool:
+    """True if the server has the APOC batching procedure installed."""
+    return bool(client.execute_query(
+        "SHOW PROCEDURES YIELD name WHERE name = 'apoc.periodic.iterate' RETURN name"
+    ))
+
+
+def apoc_create_relationships(client: Neo4jClient, rel_type: str, pairs: List[Tuple[str, str]],
+                              batch_size: int = 1000):
+    """Create relationships with apoc.periodic.iterate, which commits them in server-side batches."""
+    query = f"""
+    CALL apoc.periodic.iterate(
+        "UNWIND $pairs AS pair RETURN pair",
+        "MATCH (a:{ENTITY_LABEL} {{id: pair[0]}}), (b:{ENTITY_LABEL} {{id: pair[1]}}) CREATE (a)-[:{rel_type}]->(b)",
+        {{batchSize: $batch_size, parallel: false, params: {{pairs: $pairs}}}}
+    )
+    YIELD failedOperations, errorMessages
+    RETURN failedOperations, errorMessages
+    """
+    records = client.execute_query(query, {"pairs": pairs, "batch_size": batch_size})
+    if not records or records[0]["failedOperations"]:
+        errors = records[0]["errorMessages"] if records else "no result"
+        raise RuntimeError(f"APOC relationship load failed for {rel_type}: {errors}")
+
 
 def create_sample_data(client: Neo4jClient, graphrag: GraphRAGPipeline):
     """Create sample knowledge graph data for films and series."""
-    
-    # Sample Films
-    films = [
-        {"id": "inception", "name": "Inception", "year": 2010, "duration": 148, "rating": 8.8},
-        {"id": "interstellar", "name": "Interstellar", "year": 2014, "duration": 169, "rating": 8.6},
-        {"id": "matrix", "name": "The Matrix", "year": 1999, "duration": 136, "rating": 8.7},
-        {"id": "dark_knight", "name": "The Dark Knight", "year": 2008, "duration": 152, "rating": 9.0},
-        {"id": "pulp_fiction", "name": "Pulp Fiction", "year": 1994, "duration": 154, "rating": 8.9},
-        {"id": "fight_club", "name": "Fight Club", "year": 1999, "duration": 139, "rating": 8.8},
-        {"id": "godfather", "name": "The Godfather", "year": 1972, "duration": 175, "rating": 9.2},
-        {"id": "avatar", "name": "Avatar", "year": 2009, "duration": 162, "rating": 7.9},
-    ]
-    
-    # Sample Series
-    series = [
-        {"id": "breaking_bad", "name": "Breaking Bad", "seasons": 5, "episodes": 62, "rating": 9.5},
-        {"id": "game_of_thrones", "name": "Game of Thrones", "seasons": 8, "episodes": 73, "rating": 9.3},
-        {"id": "stranger_things", "name": "Stranger Things", "seasons": 4, "episodes": 42, "rating": 8.7},
-        {"id": "the_crown", "name": "The Crown", "seasons": 6, "episodes": 60, "rating": 8.7},
-        {"id": "dark", "name": "Dark", "seasons": 3, "episodes": 26, "rating": 8.8},
-    ]
-    
-    # Sample Actors
-    actors = [
-        {"id": "leonardo", "name": "Leonardo DiCaprio", "nationality": "American", "born": 1974},
-        {"id": "matt_damon", "name": "Matt Damon", "nationality": "American", "born": 1970},
-        {"id": "anne_hathaway", "name": "Anne Hathaway", "nationality": "American", "born": 1982},
-        {"id": "keanu_reeves", "name": "Keanu Reeves", "nationality": "Canadian", "born": 1964},
-        {"id": "christian_bale", "name": "Christian Bale", "nationality": "British", "born": 1974},
-        {"id": "john_travolta", "name": "John Travolta", "nationality": "American", "born": 1954},
-        {"id": "brad_pitt", "name": "Brad Pitt", "nationality": "American", "born": 1963},
-        {"id": "marlon_brando", "name": "Marlon Brando", "nationality": "American", "born": 1924},
-        {"id": "bryan_cranston", "name": "Bryan Cranston", "nationality": "American", "born": 1956},
-        {"id": "peter_dinklage", "name": "Peter Dinklage", "nationality": "American", "born": 1969},
-        {"id": "millie_bobby", "name": "Millie Bobby Brown", "nationality": "British", "born": 2004},
-        {"id": "olivia_colman", "name": "Olivia Colman", "nationality": "British", "born": 1974},
-    ]
-    
-    # Sample Directors
-    directors = [
-        {"id": "nolan", "name": "Christopher Nolan", "nationality": "British", "born": 1970},
-        {"id": "wachowski", "name": "Lana Wachowski", "nationality": "American", "born": 1965},
-        {"id": "tarantino", "name": "Quentin Tarantino", "nationality": "American", "born": 1963},
-        {"id": "fincher", "name": "David Fincher", "nationality": "American", "born": 1962},
-        {"id": "coppola", "name": "Francis Ford Coppola", "nationality": "American", "born": 1939},
-        {"id": "cameron", "name": "James Cameron", "nationality": "Canadian", "born": 1954},
-        {"id": "gilligan", "name": "Vince Gilligan", "nationality": "American", "born": 1967},
-        {"id": "duffer", "name": "Matt Duffer", "nationality": "American", "born": 1984},
-    ]
-    
-    # Sample Genres
-    genres = [
-        {"id": "sci_fi", "name": "Science Fiction"},
-        {"id": "action", "name": "Action"},
-        {"id": "thriller", "name": "Thriller"},
-        {"id": "drama", "name": "Drama"},
-        {"id": "crime", "name": "Crime"},
-        {"id": "fantasy", "name": "Fantasy"},
-        {"id": "horror", "name": "Horror"},
-    ]
-    
     print("Creating nodes...")
+    asyncio.run(acreate_sample_nodes(client, graphrag))
     
-    # Create Film nodes with embeddings
-    for film in films:
-        text = f"{film['name']} film {film['year']}"
-        embedding = graphrag.get_embedding(text)
-        query = """
-        CREATE (f:Film {
-            id: $id,
-            name: $name,
-            year: $year,
-            duration: $duration,
-            rating: $rating,
-            embedding: $embedding
-        })
-        """
-        client.execute_query(query, {**film, "embedding": embedding})
-    
-    # Create Series nodes with embeddings
-    for serie in series:
-        text = f"{serie['name']} series {serie['seasons']} seasons"
-        embedding = graphrag.get_embedding(text)
-        query = """
-        CREATE (s:Serie {
-            id: $id,
-            name: $name,
-            seasons: $seasons,
-            episodes: $episodes,
-            rating: $rating,
-            embedding: $embedding
-        })
-        """
-        client.execute_query(query, {**serie, "embedding": embedding})
-    
-    # Create Actor nodes with embeddings
-    for actor in actors:
-        text = f"{actor['name']} actor {actor['nationality']}"
-        embedding = graphrag.get_embedding(text)
-        query = """
-        CREATE (a:Actor {
-            id: $id,
-            name: $name,
-            nationality: $nationality,
-            born: $born,
-            embedding: $embedding
-        })
-        """
-        client.execute_query(query, {**actor, "embedding": embedding})
-    
-    # Create Director nodes with embeddings
-    for director in directors:
-        text = f"{director['name']} director {director['nationality']}"
-        embedding = graphrag.get_embedding(text)
-        query = """
-        CREATE (d:Director {
-            id: $id,
-            name: $name,
-            nationality: $nationality,
-            born: $born,
-            embedding: $embedding
-        })
-        """
-        client.execute_query(query, {**director, "embedding": embedding})
-    
-    # Create Genre nodes with embeddings
-    for genre in genres:
-        text = f"{genre['name']} genre"
-        embedding = graphrag.get_embedding(text)
-        query = """
-        CREATE (g:Genre {
-            id: $id,
-            name: $name,
-            embedding: $embedding
-        })
-        """
-        client.execute_query(query, {**genre, "embedding": embedding})
-    
+    # Nodes are committed first, so APOC's own transactions can match them
     print("Creating relationships...")
-    
-    # Actor plays in Film
-    actor_film = [
-        ("leonardo", "inception"),
-        ("leonardo", "interstellar"),
-        ("matt_damon", "interstellar"),
-        ("anne_hathaway", "interstellar"),
-        ("keanu_reeves", "matrix"),
-        ("christian_bale", "dark_knight"),
-        ("john_travolta", "pulp_fiction"),
-        ("brad_pitt", "fight_club"),
-        ("marlon_brando", "godfather"),
-    ]
-    
-    for actor_id, film_id in actor_film:
-        query = """
-        MATCH (a:Actor {id: $actor_id}), (f:Film {id: $film_id})
-        CREATE (a)-[:JOUE_DANS]->(f)
-        """
-        client.execute_query(query, {"actor_id": actor_id, "film_id": film_id})
-    
-    # Actor plays in Serie
-    actor_serie = [
-        ("bryan_cranston", "breaking_bad"),
-        ("peter_dinklage", "game_of_thrones"),
-        ("millie_bobby", "stranger_things"),
-        ("olivia_colman", "the_crown"),
-    ]
-    
-    for actor_id, serie_id in actor_serie:
-        query = """
-        MATCH (a:Actor {id: $actor_id}), (s:Serie {id: $serie_id})
-        CREATE (a)-[:JOUE_DANS]->(s)
-        """
-        client.execute_query(query, {"actor_id": actor_id, "serie_id": serie_id})
-    
-    # Director directs Film
-    director_film = [
-        ("nolan", "inception"),
-        ("nolan", "interstellar"),
-        ("nolan", "dark_knight"),
-        ("wachowski", "matrix"),
-        ("tarantino", "pulp_fiction"),
-        ("fincher", "fight_club"),
-        ("coppola", "godfather"),
-        ("cameron", "avatar"),
-    ]
-    
-    for director_id, film_id in director_film:
-        query = """
-        MATCH (d:Director {id: $director_id}), (f:Film {id: $film_id})
-        CREATE (d)-[:REALISE]->(f)
-        """
-        client.execute_query(query, {"director_id": director_id, "film_id": film_id})
-    
-    # Director directs Serie
-    director_serie = [
-        ("gilligan", "breaking_bad"),
-        ("duffer", "stranger_things"),
-    ]
-    
-    for director_id, serie_id in director_serie:
-        query = """
-        MATCH (d:Director {id: $director_id}), (s:Serie {id: $serie_id})
-        CREATE (d)-[:REALISE]->(s)
-        """
-        client.execute_query(query, {"director_id": director_id, "serie_id": serie_id})
-    
-    # Film/Serie belongs to Genre
-    film_genre = [
-        ("inception", "sci_fi"),
-        ("inception", "thriller"),
-        ("interstellar", "sci_fi"),
-        ("interstellar", "drama"),
-        ("matrix", "sci_fi"),
-        ("matrix", "action"),
-        ("dark_knight", "action"),
-        ("dark_knight", "crime"),
-        ("pulp_fiction", "crime"),
-        ("pulp_fiction", "drama"),
-        ("fight_club", "drama"),
-        ("fight_club", "thriller"),
-        ("godfather", "crime"),
-        ("godfather", "drama"),
-        ("avatar", "sci_fi"),
-        ("avatar", "action"),
-    ]
-    
-    for film_id, genre_id in film_genre:
-        query = """
-        MATCH (f:Film {id: $film_id}), (g:Genre {id: $genre_id})
-        CREATE (f)-[:APPARTIENT_A_GENRE]->(g)
-        """
-        client.execute_query(query, {"film_id": film_id, "genre_id": genre_id})
-    
-    serie_genre = [
-        ("breaking_bad", "crime"),
-        ("breaking_bad", "drama"),
-        ("game_of_thrones", "fantasy"),
-        ("game_of_thrones", "drama"),
-        ("stranger_things", "sci_fi"),
-        ("stranger_things", "horror"),
-        ("the_crown", "drama"),
-        ("dark", "sci_fi"),
-        ("dark", "thriller"),
-    ]
-    
-    for serie_id, genre_id in serie_genre:
-        query = """
-        MATCH (s:Serie {id: $serie_id}), (g:Genre {id: $genre_id})
-        CREATE (s)-[:APPARTIENT_A_GENRE]->(g)
-        """
-        client.execute_query(query, {"serie_id": serie_id, "genre_id": genre_id})
-    
-    # Actors who worked together
-    worked_together = [
-        ("leonardo", "matt_damon"),
-        ("leonardo", "anne_hathaway"),
-        ("matt_damon", "anne_hathaway"),
-    ]
-    
-    for actor1_id, actor2_id in worked_together:
-        query = """
-        MATCH (a1:Actor {id: $actor1_id}), (a2:Actor {id: $actor2_id})
-        CREATE (a1)-[:A_JOUÉ_AVEC]->(a2)
-        """
-        client.execute_query(query, {"actor1_id": actor1_id, "actor2_id": actor2_id})
+    if has_apoc(client):
+        for rel_type, pairs in SAMPLE_RELATIONSHIPS:
+            apoc_create_relationships(client, rel_type, pairs)
+    else:
+        with client.transaction() as tx:
+            for rel_type, pairs in SAMPLE_RELATIONSHIPS:
+                bulk_create_relationships(tx, rel_type, pairs)
     
     print("✅ Sample data created successfully!")
 
 
+async def acreate_sample_nodes(client: Neo4jClient, graphrag: GraphRAGPipeline):
+    """Create the sample nodes, one concurrent transaction per label."""
+    try:
+        await asyncio.gather(*(
+            acreate_nodes(client, graphrag, label, rows, texts)
+            for label, rows, texts in SAMPLE_NODE_DATA
+        ))
+    finally:
+        # The async driver is bound to this asyncio.run loop
+        await client.aclose_async_driver()
+
+
 def main():
     """Main function to set up the graph."""
     print("🚀 Setting up Neo4j knowledge graph (Films & Series)...")
@@ -287,12 +196,29 @@ def main():
     try:
         client = Neo4jClient()
         schema = GraphSchema(client)
-        graphrag = GraphRAGPipeline(client)
+        # Re-runs reuse the sample embeddings from disk instead of re-encoding them
+        graphrag = GraphRAGPipeline(
+            client, embedding_cache_path=os.getenv("EMBEDDING_CACHE_PATH", ".emb_cache")
+        )
         
         # Create constraints
         print("Creating schema constraints...")
         schema.create_constraints()
         
+        # Relationship creation matches nodes by id, which is only an index lookup with these in place
+        missing = schema.missing_constraints()
+        if missing:
+            raise RuntimeError(f"Missing id constraints: {', '.join(missing)}")
+        
+        # Create the vector index up front so embeddings are indexed as they are written
+        if INT8_ONLY:
+            print("Note: Vector index skipped (INT8-only embeddings; retrieval ranks in memory)")
+        else:
+            try:
+                client.create_vector_index()
+            except:
+                print("Note: Vector index creation skipped (may require Neo4j 5.11+)")
+        
         # Clear existing data (optional - comment out if you want to keep existing data)
         print("Clearing existing data...")
         client.execute_query("MATCH (n) DETACH DELETE n")
@@ -300,12 +226,6 @@ def main():
         # Create sample data
         create_sample_data(client, graphrag)
         
-        # Try to create vector index
-        try:
-            client.create_vector_index()
-        except:
-            print("Note: Vector index creation skipped (may require Neo4j 5.11+)")
-        
         # Show graph info
         info = client.get_graph_info()
         print("\n📊 Graph Statistics:")
@@ -314,6 +234,7 @@ def main():
         print(f"  Node Types: {', '.join(info['node_types'])}")
         print(f"  Relationship Types: {', '.join(info['relationship_types'])}")
         
+        graphrag.close()
         client.close()
         print("\n✅ Graph setup complete!")
         
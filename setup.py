@@ -1,4 +1,5 @@
 """Setup helper script for the Agentic AI system."""
+import importlib.util
 import os
 import sys
 
@@ -32,12 +33,11 @@ def check_dependencies():
         'sentence_transformers'
     ]
     
-    missing = []
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            missing.append(package)
+    # find_spec locates packages without importing them (no heavy package init)
+    missing = [
+        package for package in required_packages
+        if importlib.util.find_spec(package.replace('-', '_')) is None
+    ]
     
     if missing:
         print(f"❌ Missing packages: {', '.join(missing)}")
@@ -0,0 +1,110 @@
+"""Offline checks of the agent workflow, driven by a scripted fake chat model."""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("langchain_groq")
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+
+class StreamingChatModel(GenericFakeChatModel):
+    """Fake model that streams tool calls first, then the content word by word."""
+    
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = next(self.messages)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                for index, call in enumerate(message.tool_calls)
+            ]))
+        for word in message.content.split(" "):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def scripted_agent(monkeypatch, *responses, model=GenericFakeChatModel):
+    """AgenticAI whose LLM replies with the given messages in order."""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    from agent.agent import AgenticAI
+    
+    agent = AgenticAI(graphrag=None)
+    agent.llm_with_tools = model(messages=iter(responses))
+    return agent
+
+
+def tool_call(name: str, args: dict, call_id: str, content: str = "Working on it. ") -> AIMessage:
+    """LLM reply that selects one tool."""
+    return AIMessage(content=content, tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+def two_tool_run(monkeypatch, model=GenericFakeChatModel):
+    """Agent that calls the calculator, then web search, then answers."""
+    return scripted_agent(
+        monkeypatch,
+        tool_call("calculator", {"expression": "2 + 2"}, "1"),
+        tool_call("web_search", {"query": "inception"}, "2"),
+        AIMessage(content="The answer is 4."),
+        model=model,
+    )
+
+
+def test_two_tool_selections_give_two_steps(monkeypatch):
+    result = two_tool_run(monkeypatch).query("What is two plus two, and what is Inception?")
+    
+    assert len(result["steps"]) == 2
+    assert result["tools_used"] == ["calculator", "web_search"]
+    assert result["response"] == "The answer is 4."
+
+
+def test_astream_yields_only_the_final_answer(monkeypatch):
+    agent = two_tool_run(monkeypatch, model=StreamingChatModel)
+    result = {}
+    
+    async def collect():
+        return [token async for token in agent.astream("What is two plus two, and what is Inception?", result)]
+    
+    tokens = asyncio.run(collect())
+    
+    assert "".join(tokens).strip() == result["response"].strip() == "The answer is 4."
+    assert len(result["steps"]) == 2
+    assert result["tools_used"] == ["calculator", "web_search"]
+
+
+def test_cached_result_is_not_changed_by_callers(monkeypatch):
+    agent = two_tool_run(monkeypatch)
+    question = "What is two plus two, and what is Inception?"
+    
+    first = agent.query(question)
+    first["steps"].clear()
+    first["tools_used"].append("graph_query")
+    
+    second = agent.query(question)
+    assert len(second["steps"]) == 2
+    assert second["tools_used"] == ["calculator", "web_search"]
+
+
+def test_arithmetic_turn_in_a_conversation_skips_the_llm(monkeypatch):
+    agent = scripted_agent(monkeypatch)
+    conversation = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": "Who directed Inception?"},
+        {"role": "assistant", "content": "Christopher Nolan."},
+        {"role": "user", "content": "Calculate 25 * 17 + 100"},
+    ]
+    
+    result = agent.query(conversation)
+    
+    assert result["response"] == "The result is 525."
+    assert result["tools_used"] == ["calculator"]
+    assert result["message_count"] == 5
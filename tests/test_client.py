@@ -0,0 +1,53 @@
+"""Offline checks of the Neo4j client's async driver lifecycle."""
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+pytest.importorskip("neo4j")
+
+from graph_db import client as client_module
+from graph_db.client import Neo4jClient
+
+
+class FakeAsyncDriver:
+    """Stands in for an async driver; records whether it was closed."""
+    
+    def __init__(self, *args, **kwargs):
+        self.closed = False
+    
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def offline_client(monkeypatch):
+    """Client that never opens a real connection."""
+    monkeypatch.setattr(Neo4jClient, "_connect", lambda self: None)
+    monkeypatch.setattr(client_module.AsyncGraphDatabase, "driver", FakeAsyncDriver)
+    return Neo4jClient()
+
+
+def test_async_driver_is_closed_when_its_loop_shuts_down(offline_client):
+    async def get_driver():
+        driver = offline_client._get_async_driver()
+        await asyncio.sleep(0)
+        return driver
+    
+    first = asyncio.run(get_driver())
+    second = asyncio.run(get_driver())
+    
+    assert first is not second
+    assert first.closed and second.closed
+    assert not offline_client._async_drivers
+
+
+def test_aclose_async_driver_closes_the_running_loops_driver(offline_client):
+    async def open_and_close():
+        driver = offline_client._get_async_driver()
+        await offline_client.aclose_async_driver()
+        return driver
+    
+    assert asyncio.run(open_and_close()).closed
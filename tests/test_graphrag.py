@@ -0,0 +1,47 @@
+"""Offline checks of the retrieval caches."""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+pytest.importorskip("neo4j")
+
+from agent.graphrag import GraphRAGPipeline, SemanticCache
+
+
+def test_semantic_cache_hits_are_not_shared_with_callers():
+    cache = SemanticCache(dim=3)
+    vector = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    result = {"nodes": [{"node": {"name": "Inception"}}], "context": "Inception"}
+    
+    cache.put("Entity", vector, result)
+    result["nodes"].clear()
+    cache.get("Entity", vector)["nodes"][0]["node"]["name"] = "Changed"
+    
+    assert cache.get("Entity", vector)["nodes"] == [{"node": {"name": "Inception"}}]
+
+
+def pipeline_without_model():
+    """GraphRAGPipeline with only the state the embedding row cache needs."""
+    pipeline = GraphRAGPipeline.__new__(GraphRAGPipeline)
+    pipeline.embedding_dim = 3
+    pipeline._node_embeddings_cache = {}
+    return pipeline
+
+
+def test_node_rows_follow_the_stored_int8_embedding():
+    pipeline = pipeline_without_model()
+    first = pipeline._node_row("film_1", None, bytes([127, 0, 0]), 1 / 127)
+    
+    assert pipeline._node_row("film_1", None, bytes([127, 0, 0]), 1 / 127) is first
+    changed = pipeline._node_row("film_1", None, bytes([0, 127, 0]), 1 / 127)
+    assert changed.tolist() == pytest.approx([0.0, 1.0, 0.0])
+
+
+def test_fp32_node_rows_are_not_cached():
+    pipeline = pipeline_without_model()
+    pipeline._node_row("film_1", [3.0, 4.0, 0.0])
+    
+    assert not pipeline._node_embeddings_cache
@@ -1,7 +1,14 @@
 """Test scenarios for evaluating the Agentic AI system."""
 import sys
 import os
+import hashlib
+import json
+import shelve
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from graph_db.client import Neo4jClient
@@ -9,26 +16,88 @@ from agent.graphrag import GraphRAGPipeline
 from agent.agent import AgenticAI
 
 
+# (scenario name, query, expected tools)
+SCENARIOS = [
+    ("Graph Query - Actor Information", "Who acted in Inception?", ["graph_query"]),
+    ("Graph Query - Director Relationships", "What films did Christopher Nolan direct?", ["graph_query"]),
+    ("Graph Query - Genre Information", "What genres does Breaking Bad belong to?", ["graph_query"]),
+    ("Calculator Tool", "Calculate 125 * 47 + 892", ["calculator"]),
+    ("Complex Multi-Tool Query", "Who acted in Inception? Also calculate 15 to the power of 3.",
+     ["graph_query", "calculator"]),
+    ("Graph Traversal", "Which actors worked together?", ["graph_query"]),
+    ("Film Details Query", "What are the details of The Matrix?", ["graph_query"]),
+]
+
+
 class TestScenarios:
     """Test scenarios for system evaluation."""
     
     def __init__(self):
-        self.client = Neo4jClient()
+        # At least one pooled connection per concurrent scenario, with headroom for retrieval
+        self.client = Neo4jClient(pool_size=len(SCENARIOS) * 4)
         self.graphrag = GraphRAGPipeline(self.client)
         self.agent = AgenticAI(self.graphrag)
+        # Load the model, connections and caches up front so the first scenario's latency excludes them
+        if os.getenv("WARMUP", "1") == "1":
+            self.graphrag.warmup()
+        # Full results stream to a JSONL file as tests finish; only a slim summary of each and
+        # running aggregates stay in memory, so partial progress survives a crash
         self.results = []
+        self._results_file = open(os.getenv("TEST_RESULTS_PATH", "results.jsonl"), "w", encoding="utf-8")
+        self._total_tests = 0
+        self._latencies = []
+        self._tool_counts = Counter()
+        self._results_lock = threading.Lock()
+        self._print_lock = threading.Lock()
+        # AGENT_CACHE=1 replays agent results from disk across runs instead of calling the LLM again
+        self._cache = shelve.open(os.getenv("AGENT_CACHE_PATH", ".agent_cache")) if os.getenv("AGENT_CACHE") == "1" else None
+        self._cache_lock = threading.Lock()
+    
+    def _query(self, query: str) -> dict:
+        """Run a query through the agent, via the on-disk result cache when enabled."""
+        if self._cache is None:
+            return self.agent.query(query)
+        
+        key = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        with self._cache_lock:
+            result = self._cache.get(key)
+        if result is None:
+            result = self.agent.query(query)
+            with self._cache_lock:
+                self._cache[key] = result
+        return result
+    
+    def _report(self, lines: list):
+        """Print a test's output as one block so concurrent tests don't interleave."""
+        with self._print_lock:
+            print("\n".join(lines))
+    
+    def _record(self, test_result: dict) -> dict:
+        """Persist a result and update the running aggregates, from any worker thread."""
+        with self._results_lock:
+            self._results_file.write(json.dumps(test_result, ensure_ascii=False, default=str) + "\n")
+            self._results_file.flush()
+            self._total_tests += 1
+            if test_result["success"]:
+                self._latencies.append(test_result["latency"])
+                self._tool_counts.update(test_result["tools_used"])
+            # The response text is only kept in the file
+            self.results.append({key: value for key, value in test_result.items() if key != "response"})
+        return test_result
     
     def run_test(self, scenario_name: str, query: str, expected_tools: list = None):
         """Run a single test scenario."""
-        print(f"\n{'='*60}")
-        print(f"Test: {scenario_name}")
-        print(f"Query: {query}")
-        print(f"{'='*60}")
+        lines = [
+            f"\n{'='*60}",
+            f"Test: {scenario_name}",
+            f"Query: {query}",
+            f"{'='*60}",
+        ]
         
         start_time = time.time()
         
         try:
-            result = self.agent.query(query)
+            result = self._query(query)
             elapsed_time = time.time() - start_time
             
             # Check if expected tools were used
@@ -50,22 +119,22 @@ class TestScenarios:
                 "success": True
             }
             
-            print(f"✅ Response received in {elapsed_time:.2f}s")
-            print(f"Tools used: {result.get('tools_used', [])}")
-            print(f"Response preview: {result.get('response', '')[:200]}...")
+            lines.append(f"✅ Response received in {elapsed_time:.2f}s")
+            lines.append(f"Tools used: {result.get('tools_used', [])}")
+            lines.append(f"Response preview: {result.get('response', '')[:200]}...")
             
             if expected_tools:
                 if tools_match:
-                    print(f"✅ Expected tools used correctly")
+                    lines.append(f"✅ Expected tools used correctly")
                 else:
-                    print(f"⚠️  Expected tools: {expected_tools}, Got: {result.get('tools_used', [])}")
+                    lines.append(f"⚠️  Expected tools: {expected_tools}, Got: {result.get('tools_used', [])}")
             
-            self.results.append(test_result)
-            return test_result
+            self._report(lines)
+            return self._record(test_result)
             
         except Exception as e:
             elapsed_time = time.time() - start_time
-            print(f"❌ Error: {str(e)}")
+            lines.append(f"❌ Error: {str(e)}")
             
             test_result = {
                 "scenario": scenario_name,
@@ -75,8 +144,8 @@ class TestScenarios:
                 "success": False
             }
             
-            self.results.append(test_result)
-            return test_result
+            self._report(lines)
+            return self._record(test_result)
     
     def run_all_tests(self):
         """Run all test scenarios."""
@@ -84,54 +153,15 @@ class TestScenarios:
         print("🧪 Running Test Scenarios")
         print("="*60)
         
-        # Test Scenario 1: Graph Query - Actor Information
-        self.run_test(
-            "Graph Query - Actor Information",
-            "Who acted in Inception?",
-            expected_tools=["graph_query"]
-        )
-        
-        # Test Scenario 2: Graph Query - Director Relationships
-        self.run_test(
-            "Graph Query - Director Relationships",
-            "What films did Christopher Nolan direct?",
-            expected_tools=["graph_query"]
-        )
+        # Scenarios are independent and network-bound (LLM + Neo4j), so run them concurrently
+        with ThreadPoolExecutor(max_workers=len(SCENARIOS)) as executor:
+            futures = [executor.submit(self.run_test, *scenario) for scenario in SCENARIOS]
+            for future in as_completed(futures):
+                future.result()
         
-        # Test Scenario 3: Graph Query - Genre Information
-        self.run_test(
-            "Graph Query - Genre Information",
-            "What genres does Breaking Bad belong to?",
-            expected_tools=["graph_query"]
-        )
-        
-        # Test Scenario 4: Calculator Tool
-        self.run_test(
-            "Calculator Tool",
-            "Calculate 125 * 47 + 892",
-            expected_tools=["calculator"]
-        )
-        
-        # Test Scenario 5: Complex Multi-Tool Query
-        self.run_test(
-            "Complex Multi-Tool Query",
-            "Who acted in Inception? Also calculate 15 to the power of 3.",
-            expected_tools=["graph_query", "calculator"]
-        )
-        
-        # Test Scenario 6: Graph Traversal
-        self.run_test(
-            "Graph Traversal",
-            "Which actors worked together?",
-            expected_tools=["graph_query"]
-        )
-        
-        # Test Scenario 7: Film Details Query
-        self.run_test(
-            "Film Details Query",
-            "What are the details of The Matrix?",
-            expected_tools=["graph_query"]
-        )
+        # Report in scenario order rather than completion order
+        order = {name: i for i, (name, _, _) in enumerate(SCENARIOS)}
+        self.results.sort(key=lambda r: order.get(r["scenario"], len(order)))
         
         # Print summary
         self.print_summary()
@@ -142,28 +172,26 @@ class TestScenarios:
         print("📊 Test Summary")
         print("="*60)
         
-        total_tests = len(self.results)
-        successful_tests = sum(1 for r in self.results if r.get("success", False))
+        # Aggregates are kept up to date by _record, so no pass over the results is needed
+        latencies = np.asarray(self._latencies, dtype=np.float32)
+        tool_counts = self._tool_counts
+        
+        total_tests = self._total_tests
+        successful_tests = latencies.size
         failed_tests = total_tests - successful_tests
         
         print(f"Total Tests: {total_tests}")
         print(f"Successful: {successful_tests}")
         print(f"Failed: {failed_tests}")
-        print(f"Success Rate: {(successful_tests/total_tests*100):.1f}%")
+        if total_tests:
+            print(f"Success Rate: {(successful_tests/total_tests*100):.1f}%")
         
         if successful_tests > 0:
-            avg_latency = sum(r.get("latency", 0) for r in self.results if r.get("success")) / successful_tests
-            print(f"Average Latency: {avg_latency:.2f}s")
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(f"Average Latency: {latencies.mean():.2f}s (p50 {p50:.2f}s, p95 {p95:.2f}s)")
         
         # Tool usage statistics
-        all_tools = []
-        for result in self.results:
-            if result.get("success"):
-                all_tools.extend(result.get("tools_used", []))
-        
-        if all_tools:
-            from collections import Counter
-            tool_counts = Counter(all_tools)
+        if tool_counts:
             print("\nTool Usage:")
             for tool, count in tool_counts.items():
                 print(f"  {tool}: {count} times")
@@ -185,6 +213,9 @@ class TestScenarios:
     
     def close(self):
         """Close connections."""
+        self._results_file.close()
+        if self._cache is not None:
+            self._cache.close()
         self.client.close()
 
 
@@ -0,0 +1,44 @@
+"""Offline checks of the local arithmetic shortcut and its bounds."""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from agent.tools import evaluate_arithmetic_query
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Calculate 125 * 47 + 892", 6767),
+    ("what is 2^10?", 1024),
+    ("what is 1999-2005?", -6),
+    ("what is 2 ** 128?", 2 ** 128),
+    ("calculate 0.5 ** 200", 0.5 ** 200),
+])
+def test_arithmetic_queries_are_answered(query, expected):
+    assert evaluate_arithmetic_query(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "1999-2005",
+    "Who acted in Inception?",
+    "calculate 9**9**9",
+    "calculate 2**5000",
+    "calculate (-8)**0.5",
+])
+def test_ranges_and_unbounded_expressions_are_refused(query):
+    assert evaluate_arithmetic_query(query) is None
+
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("1.01 ** 365", 1.01 ** 365),
+    ("1.05 ** 120", 1.05 ** 120),
+    ("2 ** 128", 2 ** 128),
+])
+def test_calculator_tool_handles_large_exponents(expression, expected):
+    from agent.tools import CalculatorTool
+    
+    assert CalculatorTool()._run(expression) == f"Result: {expected}"
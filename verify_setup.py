@@ -1,4 +1,5 @@
 """Script to verify the setup is correct."""
+import importlib.util
 import os
 import sys
 
@@ -13,14 +14,23 @@ def check_files():
         'agent/agent.py',
         'agent/tools.py',
         'agent/graphrag.py',
-        'neo4j/client.py',
-        'neo4j/schema.py',
+        'graph_db/client.py',
+        'graph_db/schema.py',
         'scripts/setup_graph.py',
     ]
     
+    # One directory listing per directory instead of one stat per file
+    listings = {}
     missing = []
     for file in required_files:
-        if not os.path.exists(file):
+        directory, name = os.path.split(file)
+        if directory not in listings:
+            try:
+                with os.scandir(directory or '.') as entries:
+                    listings[directory] = {entry.name for entry in entries}
+            except FileNotFoundError:
+                listings[directory] = set()
+        if name not in listings[directory]:
             missing.append(file)
     
     if missing:
@@ -62,12 +72,11 @@ def check_dependencies():
         'sentence_transformers': 'sentence_transformers',
     }
     
-    missing = []
-    for package_name, import_name in packages.items():
-        try:
-            __import__(import_name)
-        except ImportError:
-            missing.append(package_name)
+    # find_spec locates packages without importing them (no heavy package init)
+    missing = [
+        package_name for package_name, import_name in packages.items()
+        if importlib.util.find_spec(import_name) is None
+    ]
     
     if missing:
         print(f"❌ Missing packages: {', '.join(missing)}")